@@ -0,0 +1,117 @@
+"""
+Parser throughput benchmark: lines/sec of the single-pattern classifier vs the
+original five-regex cascade on synthetic exports.
+
+    python benchmarks/bench_parser.py --lines 1000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import time
+from typing import Iterable, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from whatsapp_parser import (  # noqa: E402
+    ANDROID_RE,
+    GENERIC_RE,
+    IOS_BRACKET_RE,
+    MEDIA_ATTACHMENT_RE,
+    NEW_BRACKET_RE,
+    SYSTEM_LINE_RE,
+    ChatLine,
+    iter_chat_lines,
+    iter_lines,
+)
+
+USERS = ["~Gulmira", "Самат", "Alice Smith", "Bob", "+7 701 555 12 34"]
+WORDS = "hello привет ok да нет meeting tomorrow 😀 https://example.com see you soon".split()
+
+
+def header(dialect: str, i: int) -> str:
+    day, month, minute = 1 + i % 28, 1 + (i // 28) % 12, i % 60
+    if dialect == "bracket_seconds":
+        return f"[{month}/{day}/25, {10 + i % 12}:{minute:02d}:{i % 60:02d}]"
+    if dialect == "bracket":
+        return f"[{day:02d}.{month:02d}.2024, {10 + i % 12}:{minute:02d}]"
+    return f"{day:02d}.{month:02d}.2024, {10 + i % 12}:{minute:02d} -"
+
+
+def synthetic_export(dialect: str, n_lines: int, seed: int = 0) -> str:
+    """Chatty-group shaped export: roughly half the lines are continuations."""
+    rnd = random.Random(seed)
+    out: List[str] = []
+    i = 0
+    while len(out) < n_lines:
+        text = " ".join(rnd.choices(WORDS, k=rnd.randint(2, 12)))
+        out.append(f"{header(dialect, i)} {rnd.choice(USERS)}: {text}")
+        for _ in range(rnd.choice([0, 0, 1, 2, 3])):
+            out.append(" ".join(rnd.choices(WORDS, k=rnd.randint(1, 10))))
+        i += 1
+    return "\n".join(out[:n_lines])
+
+
+def legacy_parse(lines: Iterable[str]) -> List[ChatLine]:
+    # The original cascade, kept verbatim for comparison
+    rows: List[ChatLine] = []
+    current: Optional[ChatLine] = None
+    for raw in lines:
+        if not raw:
+            if current is not None:
+                current.text += "\n"
+            continue
+        m = (NEW_BRACKET_RE.match(raw) or
+             MEDIA_ATTACHMENT_RE.match(raw) or
+             ANDROID_RE.match(raw) or
+             IOS_BRACKET_RE.match(raw) or
+             GENERIC_RE.match(raw))
+        if m:
+            if current is not None:
+                rows.append(current)
+            if "filename" in m.groupdict() and m.group("filename"):
+                msg = f"<attached: {m.group('filename')}>"
+            else:
+                msg = m.group("msg")
+            current = ChatLine(dt_raw=m.group("dt"), user=m.group("user").strip(), text=msg, is_system=False)
+            continue
+        m2 = SYSTEM_LINE_RE.match(raw)
+        if m2:
+            if current is not None:
+                rows.append(current)
+            current = ChatLine(dt_raw=m2.group("dt"), user=None, text=m2.group("msg"), is_system=True)
+            continue
+        if current is None:
+            current = ChatLine(dt_raw="", user=None, text=raw, is_system=True)
+        else:
+            current.text += ("\n" if current.text else "") + raw
+    if current is not None:
+        rows.append(current)
+    return rows
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--lines", type=int, default=1_000_000)
+    args = ap.parse_args()
+
+    print(f"{'dialect':<16} {'legacy lines/s':>15} {'locked lines/s':>15} {'speedup':>8}")
+    for dialect in ("bracket_seconds", "bracket", "dash"):
+        lines = list(iter_lines(synthetic_export(dialect, args.lines)))
+
+        t0 = time.perf_counter()
+        before = legacy_parse(lines)
+        t1 = time.perf_counter()
+        after = list(iter_chat_lines(lines))
+        t2 = time.perf_counter()
+
+        assert before == after, f"{dialect}: parsers disagree"
+        legacy_rate, locked_rate = len(lines) / (t1 - t0), len(lines) / (t2 - t1)
+        print(f"{dialect:<16} {legacy_rate:>15,.0f} {locked_rate:>15,.0f} {locked_rate / legacy_rate:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,382 @@
+"""
+Chat renderer benchmark: page bytes per message and render ms per 1k messages of
+the template renderer vs the original inline-style string concatenation.
+
+    python benchmarks/bench_render.py --messages 1000 10000 100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+from typing import Optional
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bench_parser import synthetic_export  # noqa: E402
+from chat_render import ChatRenderer  # noqa: E402
+from media_manifest import MediaManifest  # noqa: E402
+from whatsapp_parser import iter_chat_lines, iter_lines, to_dataframe  # noqa: E402
+
+MEDIA_FILES = ["00000001-PHOTO.jpg", "00000002-AUDIO.opus", "00000003-VIDEO.mp4", "00000004-DOC.pdf"]
+MEDIA_SHARE = 0.1
+
+
+def synthetic_messages(n: int, media_dir: str, seed: int = 0) -> pd.DataFrame:
+    """Parsed synthetic chat with roughly MEDIA_SHARE of messages being attachments."""
+    df = to_dataframe(list(iter_chat_lines(iter_lines(synthetic_export("bracket", n * 3, seed)))))
+    df = df.iloc[:n].reset_index(drop=True)
+    rnd = random.Random(seed)
+    for i in range(len(df)):
+        if rnd.random() < MEDIA_SHARE:
+            df.at[i, "text"] = f"<attached: {rnd.choice(MEDIA_FILES)}>"
+            df.at[i, "is_media"] = True
+    return df
+
+
+def media_url(file_path: str, filename: str, mime_type: str) -> str:
+    return f"http://127.0.0.1:8502/media/0123456789abcdef01234567/{filename}"
+
+
+def preview_url(file_path: str) -> str:
+    return "http://127.0.0.1:8502/media/76543210fedcba9876543210/0f1e2d3c4b5a69788796a5b4c3d2e1f0.jpg"
+
+
+# ==========================
+# Original renderer, kept verbatim for comparison
+# (media helpers passed in as media_url / preview_url)
+# ==========================
+
+def legacy_render_row(row, me_user: Optional[str], media_dir: str, media_url, preview_url) -> str:
+    # Determine if this is a system message
+    if row["is_system"] or row["user"] == "—system—":
+        # System message styling
+        return f"""
+        <div style="
+            background-color: #f0f0f0; 
+            padding: 8px 12px; 
+            margin: 4px 0; 
+            border-radius: 8px; 
+            text-align: center; 
+            font-size: 0.9em; 
+            color: #666;
+            border-left: 3px solid #ddd;
+        ">
+            {row["text"]}
+        </div>
+        """
+    else:
+        # Determine message alignment based on user
+        is_my_message = row["user"] == me_user if me_user else False
+
+        # Message bubble styling - narrower bubbles
+        if is_my_message:
+            # Right side (my messages) - green
+            bubble_style = """
+                background-color: #DCF8C6; 
+                margin-left: 50%; 
+                margin-right: 0; 
+                border-radius: 18px 18px 4px 18px;
+                text-align: right;
+                max-width: 45%;
+            """
+            time_style = "text-align: right; margin-right: 8px;"
+        else:
+            # Left side (other messages) - white
+            bubble_style = """
+                background-color: #FFFFFF; 
+                margin-left: 0; 
+                margin-right: 50%; 
+                border-radius: 18px 18px 18px 4px;
+                text-align: left;
+                border: 1px solid #E5E5E5;
+                max-width: 45%;
+            """
+            time_style = "text-align: left; margin-left: 8px;"
+
+        # Format timestamp
+        timestamp_str = ""
+        if pd.notna(row["timestamp"]):
+            timestamp_str = row["timestamp"].strftime("%d.%m.%Y %H:%M")
+
+        # Handle media attachments
+        message_text = row["text"]
+        media_html = ""
+
+        if row["is_media"] and "<attached:" in message_text:
+            # Extract filename from attachment
+            match = re.search(r'<attached:\s*([^>]+)>', message_text)
+            if match:
+                filename = match.group(1).strip()
+                message_text = f"🎵 {filename}"
+
+                # Check if file exists in extracted directory
+                file_path = os.path.join(media_dir, filename)
+
+                if os.path.exists(file_path):
+                    # Check file size first
+                    file_size = os.path.getsize(file_path)
+                    if file_size == 0:
+                        media_html = f"""
+                        <div style="margin-top: 8px; color: #999; font-size: 0.9em;">
+                            ⚠️ Audio file is empty
+                        </div>
+                        """
+                    else:
+                        # Determine file type and create appropriate HTML
+                        file_ext = os.path.splitext(filename)[1].lower()
+
+                        if file_ext in ['.opus', '.mp3', '.wav', '.m4a', '.ogg']:
+                            # Audio file - embed directly in chat with proper MIME type
+                            mime_type = "audio/opus" if file_ext == '.opus' else f"audio/{file_ext[1:]}"
+                            audio_src = media_url(file_path, filename, mime_type)
+                            if audio_src:
+                                if not audio_src.startswith("data:"):
+                                    # Served audio is only fetched (by range) when played
+                                    preload = "none"
+                                    audio_sources = f"""<source src="{audio_src}" type="{mime_type}">
+                                        <source src="{audio_src}" type="audio/mpeg">"""
+                                else:
+                                    # Inline data is embedded once; the browser sniffs the codec
+                                    preload = "metadata"
+                                    audio_sources = f"""<source src="{audio_src}">"""
+                                media_html = f"""
+                                <div style="margin-top: 8px;">
+                                    <audio controls preload="{preload}" style="width: 100%; max-width: 300px; height: 40px;">
+                                        {audio_sources}
+                                        Your browser does not support the audio element.
+                                    </audio>
+                                    <div style="font-size: 0.7em; color: #666; margin-top: 2px;">
+                                        {file_size} bytes
+                                    </div>
+                                </div>
+                                """
+                            else:
+                                media_html = f"""
+                                <div style="margin-top: 8px; color: #999; font-size: 0.9em;">
+                                    ⚠️ Could not load audio file
+                                </div>
+                                """
+                        elif file_ext in ['.mp4', '.avi', '.mov', '.webm']:
+                            # Video file - create clickable thumbnail with modal
+                            poster = preview_url(file_path)
+                            if poster:
+                                video_preview = f"""
+                                    <img src="{poster}" loading="lazy" style="max-width: 200px; max-height: 150px; border-radius: 8px; display: block; margin: 0 auto;">
+                                    <div style="font-size: 0.9em; color: #666; margin-top: 4px;">▶ Click to play video</div>"""
+                            else:
+                                video_preview = """
+                                    <div style="font-size: 2em; margin-bottom: 8px;">🎥</div>
+                                    <div style="font-size: 0.9em; color: #666;">Click to play video</div>"""
+                            media_html = f"""
+                            <div style="margin-top: 8px;">
+                                <div style="
+                                    background: #f0f0f0; 
+                                    border: 2px dashed #ccc; 
+                                    padding: {'8px' if poster else '20px'}; 
+                                    text-align: center; 
+                                    border-radius: 8px; 
+                                    cursor: pointer;
+                                    max-width: 200px;
+                                " onclick="openMediaModal('video', '{filename}', '{media_url(file_path, filename, "video/mp4")}')">
+                                    {video_preview}
+                                </div>
+                            </div>
+                            """
+                        elif file_ext in ['.jpg', '.jpeg', '.png', '.gif', '.webp']:
+                            # Image file - create clickable thumbnail with modal
+                            image_src = media_url(file_path, filename, "image/jpeg")
+                            preview_src = preview_url(file_path)
+                            # The full image is only fetched when the modal opens; without a
+                            # preview the modal reuses the bubble's own image
+                            modal_src = f"'{image_src}'" if preview_src else "this.src"
+                            media_html = f"""
+                            <div style="margin-top: 8px;">
+                                <img src="{preview_src or image_src}" loading="lazy" 
+                                     style="max-width: 200px; max-height: 150px; border-radius: 8px; cursor: pointer;" 
+                                     onclick="openMediaModal('image', '{filename}', {modal_src})">
+                            </div>
+                            """
+                        else:
+                            # Other file types - show download link
+                            media_html = f"""
+                            <div style="margin-top: 8px;">
+                                <a href="{media_url(file_path, filename, "application/octet-stream")}" 
+                                   download="{filename}" 
+                                   style="color: #007bff; text-decoration: none; font-size: 0.9em;">
+                                    📎 {filename}
+                                </a>
+                            </div>
+                            """
+
+        # Create message bubble
+        return f"""
+        <div style="margin: 8px 0;">
+            <div style="{bubble_style} padding: 12px 16px; box-shadow: 0 1px 2px rgba(0,0,0,0.1);">
+                <div style="font-weight: 500; color: #128C7E; font-size: 0.9em; margin-bottom: 4px;">
+                    {row["user"]}
+                </div>
+                <div style="color: #333; line-height: 1.4; word-wrap: break-word;">
+                    {message_text}
+                </div>
+                {media_html}
+            </div>
+            <div style="{time_style} font-size: 0.75em; color: #999; margin-top: 2px;">
+                {timestamp_str}
+            </div>
+        </div>
+        """
+
+
+LEGACY_MODAL_HTML = """
+<div id="mediaModal" style="
+    display: none; 
+    position: fixed; 
+    z-index: 1000; 
+    left: 0; 
+    top: 0; 
+    width: 100%; 
+    height: 100%; 
+    background-color: rgba(0,0,0,0.8);
+    cursor: pointer;
+" onclick="closeMediaModal()">
+    <div style="
+        position: absolute;
+        top: 50%;
+        left: 50%;
+        transform: translate(-50%, -50%);
+        background: white;
+        padding: 20px;
+        border-radius: 10px;
+        max-width: 90%;
+        max-height: 90%;
+        cursor: default;
+    " onclick="event.stopPropagation()">
+        <div style="
+            display: flex;
+            justify-content: space-between;
+            align-items: center;
+            margin-bottom: 15px;
+            border-bottom: 1px solid #eee;
+            padding-bottom: 10px;
+        ">
+            <h3 id="modalTitle" style="margin: 0; color: #333;"></h3>
+            <button onclick="closeMediaModal()" style="
+                background: none;
+                border: none;
+                font-size: 24px;
+                cursor: pointer;
+                color: #999;
+            ">&times;</button>
+        </div>
+        <div id="modalContent" style="text-align: center;"></div>
+    </div>
+</div>
+
+<script>
+function openMediaModal(type, filename, dataUrl) {
+    const modal = document.getElementById('mediaModal');
+    const title = document.getElementById('modalTitle');
+    const content = document.getElementById('modalContent');
+
+    title.textContent = filename;
+
+    if (type === 'audio') {
+        content.innerHTML = `
+            <audio controls style="width: 100%; max-width: 400px;">
+                <source src="${dataUrl}" type="audio/opus">
+                Your browser does not support the audio element.
+            </audio>
+        `;
+    } else if (type === 'video') {
+        content.innerHTML = `
+            <video controls style="width: 100%; max-width: 600px; max-height: 400px;">
+                <source src="${dataUrl}" type="video/mp4">
+                Your browser does not support the video element.
+            </video>
+        `;
+    } else if (type === 'image') {
+        content.innerHTML = `
+            <img src="${dataUrl}" style="max-width: 100%; max-height: 70vh; border-radius: 8px;">
+        `;
+    }
+
+    modal.style.display = 'block';
+}
+
+function closeMediaModal() {
+    document.getElementById('mediaModal').style.display = 'none';
+}
+
+// Close modal on Escape key
+document.addEventListener('keydown', function(event) {
+    if (event.key === 'Escape') {
+        closeMediaModal();
+    }
+});
+</script>
+"""
+
+
+def legacy_render_page(messages: pd.DataFrame, me_user: Optional[str], media_dir: str) -> str:
+    chat_height = "600px"
+    chat_style = f"""
+    height: {chat_height}; 
+    overflow-y: auto; 
+    border: 1px solid #ddd; 
+    border-radius: 10px; 
+    padding: 10px; 
+    background-color: #f8f9fa;
+    margin-bottom: 20px;
+    """
+
+    chat_html = f"""
+    <div style="{chat_style}">
+    """
+    for idx, row in messages.iterrows():
+        chat_html += legacy_render_row(row, me_user, media_dir, media_url, preview_url)
+    chat_html += "</div>"
+    chat_html += LEGACY_MODAL_HTML
+    return chat_html
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--messages", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as media_dir:
+        for name in MEDIA_FILES:
+            with open(os.path.join(media_dir, name), "wb") as f:
+                f.write(b"\0" * 1024)
+
+        print(f"{'messages':>9} {'legacy B/msg':>13} {'new B/msg':>10} {'legacy ms/1k':>13} {'new ms/1k':>10} {'speedup':>8}")
+        for n in args.messages:
+            df = synthetic_messages(n, media_dir)
+            me_user = df["user"].iloc[0]
+            renderer = ChatRenderer(
+                me_user, MediaManifest.scan(media_dir),
+                media_url=lambda f: media_url(f.path, f.name, f.mime), preview_url=lambda f: preview_url(f.path),
+            )
+
+            t0 = time.perf_counter()
+            before = legacy_render_page(df, me_user, media_dir)
+            t1 = time.perf_counter()
+            after = renderer.render_page(df)
+            t2 = time.perf_counter()
+
+            k = len(df) / 1000
+            legacy_ms, new_ms = (t1 - t0) * 1000 / k, (t2 - t1) * 1000 / k
+            print(f"{len(df):>9,} {len(before.encode()) / len(df):>13,.0f} {len(after.encode()) / len(df):>10,.0f} "
+                  f"{legacy_ms:>13,.1f} {new_ms:>10,.1f} {legacy_ms / new_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
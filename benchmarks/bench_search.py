@@ -0,0 +1,108 @@
+"""
+Search benchmark: query latency of filter_df with the word + trigram index vs the
+original per-row regex `.apply` scan (and the unindexed RE2 scan) on synthetic chats.
+Also checks the peak memory the index build adds on top of the chat (Linux only).
+
+    python benchmarks/bench_search.py --messages 10000 100000 1000000 --max-build-mb 512
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+import regex as rx
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bench_parser import synthetic_export  # noqa: E402
+from search_index import SearchIndex  # noqa: E402
+from whatsapp_parser import filter_df, iter_chat_lines, iter_lines, to_dataframe  # noqa: E402
+
+# One message in RARE_EVERY carries a near-unique token, like order numbers or names
+RARE_EVERY = 1000
+QUERIES = [
+    "привет",         # whole word
+    "meet",           # word prefix
+    "ивет",           # inside a word
+    "😀",             # emoji, shorter than a trigram
+    "example.com",    # URL fragment
+    "see you soon",   # phrase
+    "tomorrow 😀",    # word and emoji
+    "voice 00000042", # rare
+]
+
+
+def synthetic_chat(n: int, seed: int = 0) -> pd.DataFrame:
+    df = to_dataframe(list(iter_chat_lines(iter_lines(synthetic_export("bracket", n * 3, seed)))))
+    df = df.iloc[:n].reset_index(drop=True)
+    rare = df.index[::RARE_EVERY]
+    df.loc[rare, "text"] = [f"invoice {i:08d} sent" for i in range(len(rare))]
+    return df
+
+
+def legacy_filter(df: pd.DataFrame, query: str) -> pd.DataFrame:
+    # The original query filter of filter_df, kept verbatim for comparison
+    out = df.copy()
+    pat = rx.compile(rx.escape(query), flags=rx.IGNORECASE)
+    return out[out["text"].apply(lambda s: bool(pat.search(s)))]
+
+
+def rss_mb(field: str) -> float:
+    """VmRSS (current) or VmHWM (peak since the last reset_peak_rss) in MB; 0 without /proc."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+def reset_peak_rss() -> None:
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")  # Resets VmHWM to the current RSS
+    except OSError:
+        pass
+
+
+def timed(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, (time.perf_counter() - t0) * 1000
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--messages", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    ap.add_argument("--max-build-mb", type=float, default=512,
+                    help="fail if building the index raises peak RSS by more than this")
+    args = ap.parse_args()
+
+    for n in args.messages:
+        df = synthetic_chat(n)
+        before = rss_mb("VmRSS")
+        reset_peak_rss()
+        index, build_ms = timed(SearchIndex.build, df["text"])
+        build_mb = rss_mb("VmHWM") - before
+        size = sum(ix.to_table().nbytes for ix in (index.words, index.trigrams))
+        print(f"\n{len(df):,} messages: index built in {build_ms / 1000:.1f} s, {size / 2**20:.0f} MB, "
+              f"peak RSS +{build_mb:.0f} MB")
+        assert build_mb <= args.max_build_mb, f"index build used {build_mb:.0f} MB > {args.max_build_mb:.0f} MB"
+        print(f"{'query':>16} {'hits':>9} {'apply ms':>9} {'scan ms':>8} {'index ms':>9} {'vs apply':>9}")
+        for query in QUERIES:
+            expected, apply_ms = timed(legacy_filter, df, query)
+            scanned, scan_ms = timed(filter_df, df, query=query, include_system=True)
+            found, index_ms = timed(filter_df, df, query=query, include_system=True, index=index)
+            assert found.index.equals(expected.index) and scanned.index.equals(expected.index), query
+            print(f"{query!r:>16} {len(found):>9,} {apply_ms:>9,.1f} {scan_ms:>8,.1f} {index_ms:>9,.1f} "
+                  f"{apply_ms / index_ms:>8.0f}x")
+
+
+if __name__ == "__main__":
+    main()
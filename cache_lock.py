@@ -0,0 +1,76 @@
+"""
+Single-flight ingestion of a chat cache directory.
+
+Parsing an export, appending to its cache and building its search index run for one
+caller at a time. cache_dir_lock takes a lock per directory inside the process (the
+sessions of a server are threads) and an advisory lock on a `.lock` file in the
+directory across processes, e.g. several server instances behind a load balancer on
+one export share. A caller that waited re-reads the cache manifest and reuses what
+the first one wrote instead of parsing again. The search index is built under a
+separate INDEX_LOCK_FILE, so building it does not hold up opening the chat.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import os
+import threading
+from typing import BinaryIO, Dict, Iterator, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+LOCK_FILE = ".lock"
+INDEX_LOCK_FILE = ".index.lock"
+
+_dir_locks: Dict[Tuple[str, str], threading.Lock] = {}
+_dir_locks_guard = threading.Lock()
+
+
+def _process_lock(cache_dir: str, name: str) -> threading.Lock:
+    key = os.path.realpath(cache_dir), name
+    with _dir_locks_guard:
+        return _dir_locks.setdefault(key, threading.Lock())
+
+
+def _lock_file(f: BinaryIO) -> None:
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        return
+    f.seek(0)
+    while True:
+        try:
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            pass  # LK_LOCK gives up after 10 s; keep waiting for the other process
+
+
+def _unlock_file(f: BinaryIO) -> None:
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextlib.contextmanager
+def cache_dir_lock(cache_dir: str, name: str = LOCK_FILE) -> Iterator[None]:
+    """Exclusive hold of cache_dir (or of the part a lock file name guards) in and across processes."""
+    with _process_lock(cache_dir, name):
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            f = open(os.path.join(cache_dir, name), "a+b")
+        except OSError:
+            # Read-only export location: no cache is written, only threads are serialised
+            yield
+            return
+        with f:
+            _lock_file(f)
+            try:
+                yield
+            finally:
+                _unlock_file(f)
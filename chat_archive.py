@@ -0,0 +1,86 @@
+"""
+Zipped WhatsApp exports, read in place.
+
+`WhatsApp Chat - X.zip` is opened as is instead of being extracted first: _chat.txt
+is stream-parsed from its member, and attachments are read from their members by
+random access only when the media server, the inline encoder or the thumbnail
+workers ask for one. Members are addressed by file name, as the chat refers to them
+(`<attached: name>`), wherever they sit inside the archive.
+
+The parsed chat and the media manifest of an archive are cached in a folder of the
+same name inside the `.whatsapp_viz_cache` directory next to it.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+import zipfile
+from typing import BinaryIO, Dict, Optional
+
+from media_manifest import SNIFF_BYTES, MediaFile, MediaManifest, sniff_mime
+
+
+def is_chat_archive(path: str) -> bool:
+    return os.path.isfile(path) and zipfile.is_zipfile(path)
+
+
+class ChatArchive:
+    def __init__(self, path: str):
+        self.path = path
+        self.mtime_ns = os.stat(path).st_mtime_ns
+        # One open ZipFile; member reads from several threads share its file handle
+        self._zip = zipfile.ZipFile(path)
+        self._lock = threading.Lock()
+        self.members: Dict[str, zipfile.ZipInfo] = {}
+        for info in self._zip.infolist():
+            name = os.path.basename(info.filename)
+            if info.is_dir() or info.filename.startswith("__MACOSX/") or name.startswith("._"):
+                continue  # Folders and macOS resource forks
+            self.members.setdefault(name, info)
+
+    def is_current(self) -> bool:
+        """False once the archive on disk has been replaced or rewritten."""
+        try:
+            return os.stat(self.path).st_mtime_ns == self.mtime_ns
+        except OSError:
+            return False
+
+    def open(self, name: str) -> BinaryIO:
+        """Seekable binary stream of a member; KeyError for an unknown name."""
+        info = self.members[name]
+        with self._lock:
+            return self._zip.open(info)
+
+    def size(self, name: str) -> Optional[int]:
+        info = self.members.get(name)
+        return None if info is None else info.file_size
+
+    def chat_fingerprint(self, name: str) -> dict:
+        """Identity of a member from the central directory, without reading it."""
+        info = self.members[name]
+        return {"size": info.file_size, "crc32": info.CRC}
+
+    def scan(self, previous: Optional[MediaManifest] = None) -> MediaManifest:
+        """Media manifest of the members; counterpart of MediaManifest.scan for a folder."""
+        known = previous.files if previous is not None else {}
+        files: Dict[str, MediaFile] = {}
+        for name, info in self.members.items():
+            mtime_ns = int(time.mktime(info.date_time + (0, 0, -1))) * 1_000_000_000
+            old = known.get(name)
+            if old is not None and (old.size, old.mtime_ns) == (info.file_size, mtime_ns):
+                files[name] = old
+                continue
+            ext = os.path.splitext(name)[1].lower()
+            try:
+                with self.open(name) as f:
+                    head = f.read(SNIFF_BYTES)
+            except (OSError, zipfile.BadZipFile):
+                head = b""
+            files[name] = MediaFile(name, os.path.join(self.path, name), info.file_size, mtime_ns, ext,
+                                    sniff_mime(head, ext))
+        return MediaManifest(self.path, self.mtime_ns, files, open_member=self.open)
+
+    def close(self) -> None:
+        self._zip.close()
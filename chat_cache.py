@@ -0,0 +1,598 @@
+"""
+Parsed chat cache: the DataFrame of an export stored beside it as Arrow files.
+
+Parsing a large export (regex + dateutil per line) takes tens of seconds, so the
+finished DataFrame is stored next to the export as uncompressed Feather (Arrow IPC)
+files. A warm open is then a memory-mapped load instead of a full reparse. The cache
+is keyed by the source file size + mtime + content hash and by PARSER_VERSION — bump
+it whenever parsing or derived columns change.
+
+Re-exports of a chat are the previous export plus new messages. When the cached
+export is a byte prefix of the new file, only the appended tail is parsed and stored
+as an extra part file, so a refresh costs O(new messages).
+
+The search box's word and trigram indexes are stored next to the parts. Each records
+which part files it was built from, so after an append only the new rows are indexed.
+Opening a chat does not build them: load_chat_frame returns a loader that the chat's
+FilterEngine runs in the background on the first search.
+
+A zipped export is parsed from its _chat.txt member (serially, as one stream) and
+cached in .whatsapp_viz_cache/<archive name>/ next to the archive. Its identity is
+the member's size + CRC-32 from the zip directory; a changed member is reparsed in
+full, as appends need byte ranges of a plain file.
+
+A loaded chat is shared read-only by every session of the process that views it,
+through ChatRegistry, and ChatCacheManager keeps the chats a browser session has
+loaded within a byte budget.
+
+Kept free of Streamlit, like whatsapp_parser, so it can be tested and benchmarked.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple, Type
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from cache_lock import INDEX_LOCK_FILE, cache_dir_lock
+from chat_archive import ChatArchive
+from filter_engine import FilterEngine
+from rollups import ChatRollups
+from search_index import PostingsIndex, SearchIndex, TrigramIndex, WordIndex
+from whatsapp_parser import (
+    PARALLEL_MIN_BYTES,
+    chat_summary,
+    detect_stream_layout,
+    find_last_header_offset,
+    frame_from_arrow,
+    iter_chat_lines,
+    iter_file_lines,
+    iter_range_records,
+    parallel_parse_to_feather,
+    parse_range_to_feather,
+    parse_stream_to_feather,
+    stream_parse_to_feather,
+    to_dataframe,
+)
+
+# ==========================
+# Parsed Chat Cache
+# ==========================
+
+PARSER_VERSION = 4
+CACHE_DIR_NAME = ".whatsapp_viz_cache"
+CACHE_MANIFEST_FILE = "manifest.json"
+MAX_CACHE_PARTS = 8  # Compact appended parts back into one file beyond this
+WORD_INDEX_FILE = "word-index.arrow"
+TRIGRAM_INDEX_FILE = "trigram-index.arrow"
+
+
+def export_cache_dir(export_path: str) -> str:
+    """Cache directory of an export folder, or of a zipped export (beside the archive)."""
+    export_path = os.path.abspath(export_path)
+    if os.path.isfile(export_path):
+        return os.path.join(os.path.dirname(export_path), CACHE_DIR_NAME, os.path.basename(export_path))
+    return os.path.join(export_path, CACHE_DIR_NAME)
+
+
+def cache_dir_for(chat_file_path: str) -> str:
+    # The chat file of an archive is addressed as <archive path>/<member name>
+    return export_cache_dir(os.path.dirname(os.path.abspath(chat_file_path)))
+
+
+def cache_part_file(index: int) -> str:
+    return f"messages-{index:04d}.arrow"
+
+
+def file_fingerprint(path: str) -> dict:
+    st_ = os.stat(path)
+    return {"size": st_.st_size, "mtime_ns": st_.st_mtime_ns}
+
+
+def _hash_stream(h, f, limit: Optional[int] = None, chunk_size: int = 1 << 20) -> None:
+    while limit is None or limit > 0:
+        chunk = f.read(chunk_size if limit is None else min(chunk_size, limit))
+        if not chunk:
+            break
+        h.update(chunk)
+        if limit is not None:
+            limit -= len(chunk)
+
+
+def hash_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        _hash_stream(h, f)
+    return h.hexdigest()
+
+
+def read_cache_manifest(cache_dir: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(cache_dir, CACHE_MANIFEST_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_cache_manifest(cache_dir: str, manifest: dict) -> None:
+    # Manifest is written last and atomically: it is the "commit" of a cache entry
+    tmp_path = os.path.join(cache_dir, CACHE_MANIFEST_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, os.path.join(cache_dir, CACHE_MANIFEST_FILE))
+
+
+def prune_cache_parts(cache_dir: str, manifest: dict) -> None:
+    """Delete part files the (just committed) manifest no longer references."""
+    referenced = {part["file"] for part in manifest["parts"]}
+    for name in os.listdir(cache_dir):
+        if name.startswith("messages-") and name.endswith(".arrow") and name not in referenced:
+            try:
+                os.remove(os.path.join(cache_dir, name))
+            except OSError:
+                pass  # e.g. still memory-mapped on Windows; retried on the next prune
+
+
+def cache_is_valid(manifest: Optional[dict], chat_file_path: str, archive: Optional[ChatArchive] = None) -> bool:
+    if not manifest or manifest.get("parser_version") != PARSER_VERSION:
+        return False
+    source = manifest.get("source", {})
+    if archive is not None:
+        current = archive.chat_fingerprint(os.path.basename(chat_file_path))
+        return all(source.get(k) == v for k, v in current.items())
+    current = file_fingerprint(chat_file_path)
+    if source.get("size") != current["size"]:
+        return False
+    if source.get("mtime_ns") == current["mtime_ns"]:
+        return True
+    # Same size but touched (e.g. copied again) — fall back to the content hash
+    return source.get("sha256") == hash_file(chat_file_path)
+
+
+def read_cached_table(cache_dir: str, manifest: dict) -> pa.Table:
+    tables = []
+    for part in manifest["parts"]:
+        table = feather.read_table(os.path.join(cache_dir, part["file"]), memory_map=True)
+        # A part's trailing rows may have been superseded by a later part
+        tables.append(table.slice(0, part["rows"]))
+    return pa.concat_tables(tables)
+
+
+def load_cached_frame(cache_dir: str, manifest: dict) -> pd.DataFrame:
+    df = frame_from_arrow(read_cached_table(cache_dir, manifest))
+    df.attrs.update(manifest.get("stats", {}))
+    return df
+
+
+def build_chat_cache(chat_file_path: str, cache_dir: str, archive: Optional[ChatArchive] = None) -> dict:
+    os.makedirs(cache_dir, exist_ok=True)
+    part_file = cache_part_file(0)
+    tmp_path = os.path.join(cache_dir, part_file + ".tmp")
+    name = os.path.basename(chat_file_path)
+    stats = None
+    if archive is not None:
+        with archive.open(name) as f:
+            stats = parse_stream_to_feather(f, tmp_path)
+        source = {"name": name, **archive.chat_fingerprint(name)}
+    else:
+        if os.path.getsize(chat_file_path) >= PARALLEL_MIN_BYTES and (os.cpu_count() or 1) > 1:
+            try:
+                stats = parallel_parse_to_feather(chat_file_path, tmp_path)
+            except Exception:
+                stats = None  # Pool failed to start (e.g. restricted host) — parse serially
+        if stats is None:
+            stats = stream_parse_to_feather(chat_file_path, tmp_path)
+        source = {"name": name, **file_fingerprint(chat_file_path), "sha256": hash_file(chat_file_path)}
+    os.replace(tmp_path, os.path.join(cache_dir, part_file))
+
+    rows = stats.pop("rows")
+    manifest = {
+        "parser_version": PARSER_VERSION,
+        "source": source,
+        "rows": rows,
+        "parts": [{"file": part_file, "rows": rows}],
+        "next_part": 1,
+        "stats": stats,
+    }
+    write_cache_manifest(cache_dir, manifest)
+    prune_cache_parts(cache_dir, manifest)
+    return manifest
+
+
+def _drop_trailing_rows(parts: List[dict], n: int) -> List[dict]:
+    """Remove n rows from the end of the part list."""
+    kept = [dict(part) for part in parts]
+    while n > 0 and kept:
+        take = min(n, kept[-1]["rows"])
+        kept[-1]["rows"] -= take
+        n -= take
+        if kept[-1]["rows"] == 0:
+            kept.pop()
+    return kept
+
+
+def append_chat_delta(chat_file_path: str, cache_dir: str, manifest: dict) -> Optional[dict]:
+    """Parse only what was appended to the export since it was cached.
+
+    Returns the updated manifest, or None if the cached export is not a prefix of
+    the current file (edited, trimmed or a different chat) and a full parse is needed.
+    """
+    if not manifest or manifest.get("parser_version") != PARSER_VERSION:
+        return None
+    source, stats = manifest["source"], manifest["stats"]
+    old_size = source["size"]
+    new_size = os.path.getsize(chat_file_path)
+    if new_size <= old_size:
+        return None
+
+    # One pass: hash the old-size prefix, compare, then finish the full-file hash
+    h = hashlib.sha256()
+    with open(chat_file_path, "rb") as f:
+        _hash_stream(h, f, limit=old_size)
+        if h.hexdigest() != source["sha256"]:
+            return None
+        _hash_stream(h, f)
+
+    # The last cached message may continue in the appended bytes, so reparse from
+    # its header line and let the new part supersede the rows parsed from there
+    dialect, dt_format = stats.get("dialect"), stats.get("datetime_format")
+    offset = find_last_header_offset(chat_file_path, old_size, dialect)
+    superseded = list(iter_range_records(chat_file_path, offset, old_size, dialect))
+    superseded_fallback = (
+        to_dataframe(superseded, dt_format).attrs["timestamp_fallback_rows"] if superseded else 0
+    )
+
+    part_index = manifest.get("next_part", len(manifest["parts"]))
+    part_file = cache_part_file(part_index)
+    tmp_path = os.path.join(cache_dir, part_file + ".tmp")
+    delta = parse_range_to_feather(chat_file_path, offset, new_size, dialect, dt_format, tmp_path)
+    os.replace(tmp_path, os.path.join(cache_dir, part_file))
+
+    parts = _drop_trailing_rows(manifest["parts"], len(superseded))
+    parts.append({"file": part_file, "rows": delta["rows"]})
+    new_stats = dict(stats)
+    new_stats["timestamp_fallback_rows"] = (
+        stats.get("timestamp_fallback_rows", 0) - superseded_fallback + delta["timestamp_fallback_rows"]
+    )
+    if new_stats.get("datetime_format") is None:
+        new_stats["datetime_format"] = delta["datetime_format"]
+    new_manifest = dict(
+        manifest,
+        source={**source, **file_fingerprint(chat_file_path), "sha256": h.hexdigest()},
+        rows=sum(part["rows"] for part in parts),
+        parts=parts,
+        next_part=part_index + 1,
+        stats=new_stats,
+    )
+    new_manifest.pop("summary", None)  # Recomputed from the updated frame
+    if len(parts) > MAX_CACHE_PARTS:
+        new_manifest = compact_chat_cache(cache_dir, new_manifest)
+    write_cache_manifest(cache_dir, new_manifest)
+    prune_cache_parts(cache_dir, new_manifest)
+    return new_manifest
+
+
+def compact_chat_cache(cache_dir: str, manifest: dict) -> dict:
+    """Rewrite all parts into one new part file (the manifest is not written here)."""
+    part_index = manifest["next_part"]
+    part_file = cache_part_file(part_index)
+    tmp_path = os.path.join(cache_dir, part_file + ".tmp")
+    table = read_cached_table(cache_dir, manifest)
+    with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp_path, os.path.join(cache_dir, part_file))
+    # Old parts stay on disk until the caller commits the new manifest and prunes
+    return dict(manifest, parts=[{"file": part_file, "rows": manifest["rows"]}], next_part=part_index + 1)
+
+
+def cache_part_identity(cache_dir: str, manifest: dict) -> List[dict]:
+    """Part files with their rows in use; files are immutable, so size + mtime identify them."""
+    parts = []
+    for part in manifest["parts"]:
+        st_ = os.stat(os.path.join(cache_dir, part["file"]))
+        parts.append({"file": part["file"], "rows": part["rows"], "size": st_.st_size, "mtime_ns": st_.st_mtime_ns})
+    return parts
+
+
+def _indexed_rows(indexed_parts: List[dict], parts: List[dict]) -> int:
+    """Leading rows of the current parts that an index built from indexed_parts still covers."""
+    rows = 0
+    for old, new in zip(indexed_parts, parts):
+        if (old["file"], old["size"], old["mtime_ns"]) != (new["file"], new["size"], new["mtime_ns"]):
+            break
+        rows += min(old["rows"], new["rows"])
+        if old["rows"] != new["rows"]:
+            break  # Trailing rows superseded by a later part
+    return rows
+
+
+def load_postings_index(cache_dir: str, index_file: str, index_cls: Type[PostingsIndex],
+                        parts: List[dict], df: pd.DataFrame, persist: bool = True) -> PostingsIndex:
+    """Index of df's text: loaded from the cache, extended with new rows, or built.
+
+    df holds the rows of `parts`; a new index is written back only with persist.
+    """
+    index_path = os.path.join(cache_dir, index_file)
+    index, covered = None, 0
+    try:
+        table = feather.read_table(index_path, memory_map=True)
+        index = index_cls.from_table(table)
+        covered = _indexed_rows(json.loads(table.schema.metadata[b"parts"]), parts)
+    except (OSError, ValueError, KeyError, pa.ArrowInvalid):
+        pass  # Missing or unreadable — built below
+    if index is not None and covered == index.n_rows == len(df):
+        return index
+
+    if index is not None and covered:
+        index = index.extend(df["text"].iloc[covered:], covered)
+    else:
+        index = index_cls.build(df["text"])
+    if not persist:
+        return index
+    try:
+        table = index.to_table({"parts": json.dumps(parts)})
+        tmp_path = index_path + ".tmp"
+        with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp_path, index_path)
+    except OSError:
+        pass  # Not persisted; rebuilt on the next load
+    return index
+
+
+def search_index_loader(cache_dir: str, manifest: dict, df: pd.DataFrame) -> Callable[[], SearchIndex]:
+    """Loads the search index of df, read from the parts of manifest, when called.
+
+    Takes its own lock, not the cache directory's: an open or append of the chat does
+    not wait for an index build. If the cache moved on meanwhile, the index is built
+    for df without being stored.
+    """
+    parts = cache_part_identity(cache_dir, manifest)
+
+    def load() -> SearchIndex:
+        with cache_dir_lock(cache_dir, INDEX_LOCK_FILE):
+            current = read_cache_manifest(cache_dir)
+            try:
+                persist = current is not None and cache_part_identity(cache_dir, current) == parts
+            except OSError:
+                persist = False  # A part file was replaced and pruned
+            return SearchIndex(
+                load_postings_index(cache_dir, WORD_INDEX_FILE, WordIndex, parts, df, persist),
+                load_postings_index(cache_dir, TRIGRAM_INDEX_FILE, TrigramIndex, parts, df, persist),
+            )
+    return load
+
+
+@dataclass(frozen=True)
+class CacheCheck:
+    """cache_is_valid's verdict on a manifest, so a load right after need not hash the source again."""
+    manifest: Optional[dict]
+    valid: bool
+
+    @property
+    def summary(self) -> Optional[dict]:
+        """chat_summary stored with a valid cache, read without loading any messages."""
+        return self.manifest.get("summary") if self.valid else None
+
+
+def check_chat_cache(chat_file_path: str, archive: Optional[ChatArchive] = None) -> CacheCheck:
+    manifest = read_cache_manifest(cache_dir_for(chat_file_path))
+    return CacheCheck(manifest, cache_is_valid(manifest, chat_file_path, archive))
+
+
+def load_chat_frame(chat_file_path: str, archive: Optional[ChatArchive] = None, checked: Optional[CacheCheck] = None
+                    ) -> Tuple[pd.DataFrame, Callable[[], SearchIndex], dict, str]:
+    """Return (df, search index loader, summary, how) for a _chat.txt; how is "cached", "appended" or "parsed".
+
+    With an archive, chat_file_path is <archive path>/<member name>. `checked` is a
+    check_chat_cache result from just before, reused if the manifest is unchanged.
+    Single-flight per cache directory: a caller that finds another session or server
+    process ingesting the same chat waits for it, then loads the cache it wrote.
+    """
+    cache_dir = cache_dir_for(chat_file_path)
+    with cache_dir_lock(cache_dir):
+        return _load_chat_frame(chat_file_path, cache_dir, archive, checked)
+
+
+def _load_chat_frame(chat_file_path: str, cache_dir: str, archive: Optional[ChatArchive],
+                     checked: Optional[CacheCheck]) -> Tuple[pd.DataFrame, Callable[[], SearchIndex], dict, str]:
+    # Read under the lock: reflects whatever the previous holder committed
+    manifest = read_cache_manifest(cache_dir)
+    if checked is not None and checked.manifest == manifest:
+        valid = checked.valid
+    else:
+        valid = cache_is_valid(manifest, chat_file_path, archive)
+    loaded = None
+    if valid:
+        try:
+            loaded = load_cached_frame(cache_dir, manifest), "cached"
+        except Exception:
+            pass  # Corrupt/partial cache — reparse below
+    elif manifest and archive is None:
+        try:
+            manifest = append_chat_delta(chat_file_path, cache_dir, manifest)
+            if manifest:
+                loaded = load_cached_frame(cache_dir, manifest), "appended"
+        except Exception:
+            pass  # Fall back to a full reparse
+
+    if loaded is None:
+        try:
+            manifest = build_chat_cache(chat_file_path, cache_dir, archive)
+            loaded = load_cached_frame(cache_dir, manifest), "parsed"
+        except OSError:
+            pass  # Read-only export location — parse in memory without a cache
+
+    if loaded is None:
+        with (archive.open(os.path.basename(chat_file_path)) if archive else open(chat_file_path, "rb")) as f:
+            dialect, dt_format = detect_stream_layout(f)
+            df = to_dataframe(list(iter_chat_lines(iter_file_lines(f), dialect=dialect or "")), dt_format)
+        return df, lambda: SearchIndex.build(df["text"]), chat_summary(df), "parsed"
+    df, how = loaded
+    summary = manifest.get("summary")
+    if summary is None:
+        # Stored with the cache so the next open can show it before loading messages
+        summary = chat_summary(df)
+        try:
+            write_cache_manifest(cache_dir, dict(manifest, summary=summary))
+        except OSError:
+            pass
+    return df, search_index_loader(cache_dir, manifest, df), summary, how
+
+
+# ==========================
+# Shared Chats
+# ==========================
+# A loaded chat (frame, filter engine with its search index, rollups, summary) is shared
+# read-only by every session of the server process that views it. The app keeps one
+# registry per process, keyed by the export's canonical path and fingerprint, so N
+# viewers of one export hold one copy and a re-exported file gets a new entry.
+# Entries are held weakly: a chat stays in memory while some session keeps it loaded,
+# which leaves each session's ChatCacheManager budget in charge of what is kept.
+# Filter state and filtered frames stay per session. Concurrent first loads of a chat
+# are single-flight: one per key in the registry, one per cache directory on disk.
+
+@dataclass(frozen=True, eq=False)
+class LoadedChat:
+    df: pd.DataFrame  # Shared: never modified in place
+    filter_engine: FilterEngine
+    rollups: ChatRollups
+    summary: dict
+    how: str  # "cached", "appended" or "parsed"
+
+    @property
+    def nbytes(self) -> int:
+        frame = int(self.df.memory_usage(index=False, deep=True).sum())
+        return frame + self.filter_engine.nbytes + self.rollups.nbytes
+
+
+class ChatRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._chats: "weakref.WeakValueDictionary[tuple, LoadedChat]" = weakref.WeakValueDictionary()
+        # Per-key locks of the loads in flight
+        self._loading: Dict[tuple, threading.Lock] = {}
+
+    def get(self, key: tuple) -> Optional[LoadedChat]:
+        with self._lock:
+            return self._chats.get(key)
+
+    def get_or_load(self, key: tuple, load: Callable[[], LoadedChat]) -> Tuple[LoadedChat, bool]:
+        """(chat, shared): the registered chat, or the result of one load() shared by concurrent callers."""
+        with self._lock:
+            chat = self._chats.get(key)
+            if chat is not None:
+                return chat, True
+            loading = self._loading.setdefault(key, threading.Lock())
+        with loading:
+            chat = self.get(key)
+            if chat is not None:
+                return chat, True  # Loaded by the caller this one waited for
+            try:
+                chat = load()
+                with self._lock:
+                    self._chats[key] = chat
+            finally:
+                with self._lock:
+                    if self._loading.get(key) is loading:
+                        del self._loading[key]
+            return chat, False
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._chats)
+
+
+def chat_source_key(chat_file_path: str, archive: Optional[ChatArchive] = None) -> tuple:
+    """Canonical path + fingerprint of a chat's source file (or archive member)."""
+    if archive is not None:
+        name = os.path.basename(chat_file_path)
+        fingerprint = archive.chat_fingerprint(name)
+        return os.path.realpath(archive.path), name, fingerprint["size"], fingerprint["crc32"]
+    st_ = os.stat(chat_file_path)
+    return os.path.realpath(chat_file_path), st_.st_size, st_.st_mtime_ns
+
+
+def load_chat(chat_file_path: str, archive: Optional[ChatArchive] = None,
+              checked: Optional[CacheCheck] = None) -> LoadedChat:
+    df, load_index, summary, how = load_chat_frame(chat_file_path, archive, checked)
+    return LoadedChat(df, FilterEngine(df, load_index=load_index), ChatRollups(df), summary, how)
+
+
+# ==========================
+# Session Chat Cache
+# ==========================
+# Every chat viewed in a browser session keeps its loaded chat (shared with other
+# sessions viewing it) and last filtered frame in the app's session_state.
+# ChatCacheManager bounds them by an approximate byte budget: beyond it, the least
+# recently viewed chats drop that data and keep only their small entries (paths,
+# summary, media manifest). Viewing one again reloads it from the parsed cache on
+# disk, or takes it from the registry if another session still has it loaded.
+
+# Per-chat entries unloaded on eviction
+LOADED_CHAT_ENTRIES = ('chat', 'filtered')
+
+
+def chat_cache_bytes(chat_cache: dict) -> int:
+    """Approximate memory of a chat's loaded data."""
+    chat = chat_cache.get('chat')
+    df = chat.df if chat is not None else None
+    total = chat.nbytes if chat is not None else 0
+    filtered = chat_cache.get('filtered')
+    if filtered is not None and filtered[1] is not df:
+        total += int(filtered[1].memory_usage(index=False, deep=True).sum())
+    return total
+
+
+class ChatCacheManager:
+    """Per-session caches of the viewed chats, least recently viewed first, within a byte budget."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._chats: "OrderedDict[str, dict]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+
+    def get(self, name: str) -> dict:
+        """The chat's cache (empty the first time), marked as the most recently viewed."""
+        chat_cache = self._chats.setdefault(name, {})
+        self._chats.move_to_end(name)
+        return chat_cache
+
+    def fit(self, name: str) -> List[str]:
+        """Measure chat `name`, then unload the least recently viewed others while over budget.
+
+        The chat being viewed is never unloaded, even on its own over budget. Returns
+        the unloaded chats.
+        """
+        self._sizes[name] = chat_cache_bytes(self._chats[name])
+        evicted = []
+        for other in list(self._chats):
+            if self.total_bytes <= self.max_bytes:
+                break
+            if other != name and self._sizes.get(other):
+                self.evict(other)
+                evicted.append(other)
+        return evicted
+
+    def evict(self, name: str) -> None:
+        chat_cache = self._chats[name]
+        for key in LOADED_CHAT_ENTRIES:
+            chat_cache.pop(key, None)
+        self._sizes[name] = 0
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(self._sizes.values())
+
+    def loaded(self) -> List[str]:
+        """Chats with data in memory, least recently viewed first."""
+        return [name for name, chat_cache in self._chats.items() if 'chat' in chat_cache]
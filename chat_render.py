@@ -0,0 +1,152 @@
+"""
+HTML renderer for the chat view.
+
+Rows are built from precompiled templates and styled by CSS classes from one shared
+stylesheet (chat_view/frontend/chat.css), instead of repeating several hundred bytes
+of inline style in every bubble. Pages are joined once from a list of rows, so
+render time and page size grow linearly with the number of messages.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from html import escape
+from typing import Callable, List, Optional
+
+import pandas as pd
+
+from media_manifest import AUDIO_EXTENSIONS, IMAGE_EXTENSIONS, VIDEO_EXTENSIONS, MediaFile, MediaManifest
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "chat_view", "frontend")
+
+
+def _read_asset(name: str) -> str:
+    with open(os.path.join(ASSETS_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+
+CHAT_CSS = _read_asset("chat.css")
+MEDIA_MODAL_JS = _read_asset("media_modal.js")
+
+SYSTEM_USER = "—system—"
+ATTACHMENT_RE = re.compile(r'<attached:\s*([^>]+)>')
+TIME_FORMAT = "%d.%m.%Y %H:%M"
+
+# ==========================
+# Templates
+# ==========================
+# Bound str.format methods: the format strings are parsed once, not per message.
+# Text and names are escaped by the caller; URLs come from the media server
+# (percent-encoded) or are data URIs, so they are inserted as is.
+
+_SYSTEM_ROW = '<div class="sys">{}</div>'.format
+_MESSAGE_ROW = (
+    '<div class="msg {side}"><div class="bubble">'
+    '<div class="user">{user}</div><div class="text">{text}</div>{media}'
+    '</div><div class="time">{time}</div></div>'
+).format
+_MEDIA_NOTE = '<div class="media note">⚠️ {}</div>'.format
+_AUDIO = (
+    '<div class="media"><audio controls preload="{preload}">{sources}'
+    'Your browser does not support the audio element.</audio>'
+    '<div class="size">{size} bytes</div></div>'
+).format
+_AUDIO_SOURCE = '<source src="{}" type="{}">'.format
+_AUDIO_SOURCE_SNIFFED = '<source src="{}">'.format
+_VIDEO = (
+    '<div class="media"><div class="video{poster_class}" data-modal="video" '
+    'data-title="{title}" data-src="{src}">{preview}</div></div>'
+).format
+_VIDEO_POSTER = '<img src="{}" loading="lazy"><div class="label">▶ Click to play video</div>'.format
+_VIDEO_ICON = '<div class="icon">🎥</div><div class="label">Click to play video</div>'
+_IMAGE = (
+    '<div class="media"><img class="thumb" src="{src}" loading="lazy" '
+    'data-modal="image" data-title="{title}"{full}></div>'
+).format
+_FILE = '<div class="media"><a class="file" href="{src}" download="{title}">📎 {title}</a></div>'.format
+_PAGE = (
+    '<!DOCTYPE html><html><head><meta charset="utf-8"><style>{css}</style></head>'
+    '<body><div class="chat">{rows}</div><script>{js}</script></body></html>'
+).format
+
+
+class ChatRenderer:
+    """Renders chat rows for one view.
+
+    Attachments are looked up in the folder's media manifest, not on disk.
+    `media_url(media_file)` returns a URL or data URI for an attachment ("" if
+    unreadable); `preview_url(media_file)` returns the URL of a ready thumbnail or "".
+    """
+
+    def __init__(self, me_user: Optional[str], media: MediaManifest,
+                 media_url: Callable[[MediaFile], str],
+                 preview_url: Callable[[MediaFile], str]):
+        self.me_user = me_user
+        self.media = media
+        self.media_url = media_url
+        self.preview_url = preview_url
+
+    def render_rows(self, messages: pd.DataFrame) -> List[str]:
+        """One HTML fragment per message, in order."""
+        times = messages["timestamp"].dt.strftime(TIME_FORMAT).fillna("")
+        rows: List[str] = []
+        append = rows.append
+        for user, text, is_system, is_media, time_str in zip(
+                messages["user"], messages["text"], messages["is_system"], messages["is_media"], times):
+            if is_system or user == SYSTEM_USER:
+                append(_SYSTEM_ROW(escape(text)))
+                continue
+            media = ""
+            if is_media and "<attached:" in text:
+                match = ATTACHMENT_RE.search(text)
+                if match:
+                    filename = match.group(1).strip()
+                    text = f"🎵 {filename}"
+                    media = self.render_media(filename)
+            append(_MESSAGE_ROW(
+                side="me" if self.me_user and user == self.me_user else "other",
+                user=escape(user), text=escape(text), media=media, time=time_str,
+            ))
+        return rows
+
+    def render_media(self, filename: str) -> str:
+        """Player, preview or download link for an attachment; "" if the file is missing."""
+        media_file = self.media.get(filename)
+        if media_file is None:
+            return ""
+        file_size = media_file.size
+        if file_size == 0:
+            return _MEDIA_NOTE("Audio file is empty")
+
+        title = escape(filename)
+        file_ext = media_file.ext
+        if file_ext in AUDIO_EXTENSIONS:
+            src = self.media_url(media_file)
+            if not src:
+                return _MEDIA_NOTE("Could not load audio file")
+            if src.startswith("data:"):
+                # Inline data is embedded once; the browser sniffs the codec
+                return _AUDIO(preload="metadata", sources=_AUDIO_SOURCE_SNIFFED(src), size=file_size)
+            # Served audio is only fetched (by range) when played
+            sources = _AUDIO_SOURCE(src, media_file.mime) + _AUDIO_SOURCE(src, "audio/mpeg")
+            return _AUDIO(preload="none", sources=sources, size=file_size)
+        if file_ext in VIDEO_EXTENSIONS:
+            poster = self.preview_url(media_file)
+            return _VIDEO(
+                poster_class=" poster" if poster else "", title=title,
+                src=self.media_url(media_file),
+                preview=_VIDEO_POSTER(poster) if poster else _VIDEO_ICON,
+            )
+        if file_ext in IMAGE_EXTENSIONS:
+            src = self.media_url(media_file)
+            preview = self.preview_url(media_file)
+            # The full image is only fetched when the modal opens; without a
+            # preview the modal reuses the bubble's own image
+            full = f' data-src="{src}"' if preview else ""
+            return _IMAGE(src=preview or src, title=title, full=full)
+        return _FILE(src=self.media_url(media_file), title=title)
+
+    def render_page(self, messages: pd.DataFrame) -> str:
+        """Standalone page (stylesheet, rows, modal script) for components.html."""
+        return _PAGE(css=CHAT_CSS, rows="".join(self.render_rows(messages)), js=MEDIA_MODAL_JS)
@@ -0,0 +1,31 @@
+"""
+Virtualised chat view component.
+
+Streamlit re-sends a `components.html` page in full on every run, so showing a long
+chat means building and shipping HTML for every message. This component keeps one
+iframe alive and receives only a window of pre-rendered rows. Spacers stand in for
+the rest of the chat, and when the user scrolls near the edge of the window the
+component reports a new start row; the next run renders that slice.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import List, Optional
+
+import streamlit.components.v1 as components
+
+_FRONTEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "frontend")
+_component = components.declare_component("chat_view", path=_FRONTEND_DIR)
+
+
+def chat_window(rows: List[str], start: int, total: int, view: str, window: int,
+                height: int = 620, key: Optional[str] = None) -> Optional[dict]:
+    """Show rows[start:start + len(rows)] of a `total`-row chat.
+
+    `view` identifies the list being scrolled (e.g. the current filter result); a new
+    view resets the scroll position. Returns the last window the user asked for,
+    {"view": ..., "start": ...}, or None before the first scroll.
+    """
+    return _component(rows=rows, start=start, total=total, view=view, window=window,
+                      height=height, key=key, default=None)
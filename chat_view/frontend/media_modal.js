@@ -0,0 +1,65 @@
+// Media modal for the chat view. Attachments carry their target in data attributes
+// (data-modal = kind, data-title, data-src; images without data-src open their own
+// src), so the rows need no inline handlers and one listener serves every row.
+
+(function() {
+    const modal = document.createElement('div');
+    modal.id = 'mediaModal';
+    modal.innerHTML = `
+        <div class="dialog">
+            <div class="header">
+                <h3 id="modalTitle"></h3>
+                <button class="close">&times;</button>
+            </div>
+            <div id="modalContent"></div>
+        </div>
+    `;
+    document.body.appendChild(modal);
+
+    const title = modal.querySelector('#modalTitle');
+    const content = modal.querySelector('#modalContent');
+
+    function openMediaModal(type, filename, src) {
+        title.textContent = filename;
+        content.textContent = '';
+
+        let el;
+        if (type === 'audio') {
+            el = document.createElement('audio');
+            el.controls = true;
+        } else if (type === 'video') {
+            el = document.createElement('video');
+            el.controls = true;
+        } else {
+            el = document.createElement('img');
+        }
+        el.src = src;
+        content.appendChild(el);
+        modal.style.display = 'block';
+    }
+
+    function closeMediaModal() {
+        modal.style.display = 'none';
+        content.textContent = '';  // Stops playback and releases the media
+    }
+
+    modal.addEventListener('click', function(event) {
+        if (event.target === modal || event.target.closest('.close')) {
+            closeMediaModal();
+        }
+    });
+
+    document.addEventListener('click', function(event) {
+        const el = event.target.closest('[data-modal]');
+        if (el) {
+            openMediaModal(el.dataset.modal, el.dataset.title, el.dataset.src || el.currentSrc || el.src);
+        }
+    });
+
+    // Close modal on Escape key
+    document.addEventListener('keydown', function(event) {
+        if (event.key === 'Escape') {
+            closeMediaModal();
+        }
+    });
+})();
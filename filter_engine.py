@@ -0,0 +1,196 @@
+"""
+Row selection for the sidebar filters and the search box.
+
+FilterEngine is built once per loaded chat. It keeps a packed bitmap per participant
+and for system messages, and the row order by timestamp, so a filter is a bitmap OR
+over the selected participants, two binary searches for the date range, and a bit
+test on the surviving rows. It returns ascending row positions; callers take them
+with df.iloc instead of copying and masking the whole frame.
+
+All filter inputs of a rerun form one FilterState; the rows of recent states are
+memoised, so a rerun with unchanged filters does no filtering work. An engine is
+shared by every session viewing its chat, so the memo is guarded by a lock.
+
+The search index may be given as a loader instead: the first query starts it in a
+background thread and queries scan the texts until the index is ready.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from search_index import SearchIndex, search_mask
+
+NAT = np.iinfo(np.int64).min
+# Below this share of all rows, checking the query on each row beats an index lookup
+SCAN_SELECTED = 0.1
+# Filter states whose rows are kept per engine
+FILTER_CACHE_STATES = 8
+
+
+def test_bits(bits: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """Boolean per row: is the row's bit set in a np.packbits bitmap."""
+    shifts = (7 - (rows & 7)).astype(np.uint8)
+    return ((bits[rows >> 3] >> shifts) & 1).astype(bool)
+
+
+@dataclass(frozen=True)
+class FilterState:
+    """Everything that decides which rows are shown; hashable, so it keys the memo."""
+    users: Tuple[str, ...] = ()
+    date_range: Optional[Tuple[pd.Timestamp, pd.Timestamp]] = None
+    query: str = ""
+    include_system: bool = False
+
+    @classmethod
+    def of(cls, users: Optional[Iterable[str]] = None,
+           date_range: Optional[Tuple[pd.Timestamp, pd.Timestamp]] = None,
+           query: str = "", include_system: bool = False) -> "FilterState":
+        # Widget order does not change the selection
+        return cls(tuple(sorted(set(users or ()))), date_range if date_range and all(date_range) else None,
+                   query, bool(include_system))
+
+
+class FilterEngine:
+    def __init__(self, df: pd.DataFrame, index: Optional[SearchIndex] = None,
+                 load_index: Optional[Callable[[], SearchIndex]] = None):
+        self.n_rows = len(df)
+        self.texts = df["text"]
+        self.index = index
+        self._load_index = load_index if index is None else None
+        self._index_lock = threading.Lock()
+        self._memo: "OrderedDict[FilterState, np.ndarray]" = OrderedDict()
+        self._memo_lock = threading.Lock()
+
+        users = df["user"].astype("category")
+        self.user_codes: Dict[str, int] = {u: i for i, u in enumerate(users.cat.categories)}
+        codes = users.cat.codes.to_numpy()
+        # Rows of each participant, grouped by code; bitmaps are packed on first use
+        self._rows_by_user = np.argsort(codes, kind="stable")
+        self._user_offsets = np.searchsorted(codes[self._rows_by_user], np.arange(len(self.user_codes) + 1))
+        self._user_bits: Dict[int, np.ndarray] = {}
+        self.system_bits = np.packbits(df["is_system"].to_numpy(dtype=bool))
+
+        # Timestamped rows by time; parse failures (NaT) never match a date range
+        times = df["timestamp"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+        timed = np.flatnonzero(times != NAT)
+        self._time_sorted = bool(np.all(np.diff(times[timed]) >= 0))
+        self.time_order = timed if self._time_sorted else timed[np.argsort(times[timed], kind="stable")]
+        self.sorted_times = times[self.time_order]
+
+    @property
+    def nbytes(self) -> int:
+        """Memory of the bitmaps, time order, memoised rows and search index (not the texts)."""
+        arrays = [self._rows_by_user, self._user_offsets, self.system_bits, self.time_order, self.sorted_times,
+                  *list(self._user_bits.values()), *list(self._memo.values())]
+        return sum(a.nbytes for a in arrays) + (self.index.nbytes if self.index is not None else 0)
+
+    def search_index(self) -> Optional[SearchIndex]:
+        """The search index if ready; the first call starts loading it in the background."""
+        with self._index_lock:
+            if self.index is None and self._load_index is not None:
+                load, self._load_index = self._load_index, None
+                threading.Thread(target=self._finish_index_load, args=(load,), name="search-index",
+                                 daemon=True).start()
+            return self.index
+
+    def _finish_index_load(self, load: Callable[[], SearchIndex]) -> None:
+        try:
+            index = load()
+        except Exception:
+            return  # Queries keep scanning the texts
+        with self._index_lock:
+            self.index = index
+
+    def user_bits(self, user: str) -> Optional[np.ndarray]:
+        """Packed bitmap of the participant's rows; None for an unknown name."""
+        code = self.user_codes.get(user)
+        return None if code is None else self._code_bits(code)
+
+    def _code_bits(self, code: int) -> np.ndarray:
+        if code not in self._user_bits:
+            bits = np.zeros(self.n_rows, dtype=bool)
+            bits[self._rows_by_user[self._user_offsets[code]:self._user_offsets[code + 1]]] = True
+            self._user_bits[code] = np.packbits(bits)
+        return self._user_bits[code]
+
+    def users_bitmap(self, users: Iterable[str]) -> Optional[np.ndarray]:
+        """OR of the participants' bitmaps; None when they cover every participant."""
+        codes = {self.user_codes[u] for u in users if u in self.user_codes}
+        if len(codes) == len(self.user_codes):
+            return None
+        bits = np.zeros((self.n_rows + 7) // 8, dtype=np.uint8)
+        for code in codes:
+            bits |= self._code_bits(code)
+        return bits
+
+    def date_rows(self, date_range: Tuple[pd.Timestamp, pd.Timestamp]) -> np.ndarray:
+        """Ascending rows with start <= timestamp <= end."""
+        start, end = (pd.Timestamp(t).as_unit("ns").value for t in date_range)
+        lo = np.searchsorted(self.sorted_times, start, side="left")
+        hi = np.searchsorted(self.sorted_times, end, side="right")
+        rows = self.time_order[lo:hi]
+        return rows if self._time_sorted else np.sort(rows)
+
+    def time_order_of(self, rows: np.ndarray) -> Optional[np.ndarray]:
+        """Positions into ascending `rows` that put them in timestamp order, untimestamped rows last.
+
+        None if the rows already are in that order, as in any chat exported oldest first.
+        """
+        if self._time_sorted and len(self.time_order) == self.n_rows:
+            return None
+        selected = np.zeros(self.n_rows, dtype=bool)
+        selected[rows] = True
+        timed = self.time_order[selected[self.time_order]]
+        selected[timed] = False
+        return np.searchsorted(rows, np.concatenate([timed, np.flatnonzero(selected)]))
+
+    def rows(self, state: FilterState) -> np.ndarray:
+        """select() for a filter state, memoised over the last few states."""
+        with self._memo_lock:
+            rows = self._memo.get(state)
+            if rows is not None:
+                self._memo.move_to_end(state)
+                return rows
+        # Filtered outside the lock: another session may compute the same state meanwhile
+        rows = self.select(state.users, state.date_range, state.query, state.include_system)
+        rows.flags.writeable = False  # Shared by every caller of this state
+        with self._memo_lock:
+            self._memo[state] = rows
+            self._memo.move_to_end(state)
+            if len(self._memo) > FILTER_CACHE_STATES:
+                self._memo.popitem(last=False)
+        return rows
+
+    def select(
+        self,
+        users: Optional[Iterable[str]] = None,
+        date_range: Optional[Tuple[pd.Timestamp, pd.Timestamp]] = None,
+        query: str = "",
+        include_system: bool = False,
+    ) -> np.ndarray:
+        """Ascending row positions passing the filters."""
+        if date_range and all(date_range):
+            rows = self.date_rows(date_range)
+        else:
+            rows = np.arange(self.n_rows)
+        if users:
+            bits = self.users_bitmap(users)
+            if bits is not None:
+                rows = rows[test_bits(bits, rows)]
+        if not include_system:
+            rows = rows[~test_bits(self.system_bits, rows)]
+        if query:
+            # Case-insensitive contains, supports Cyrillic
+            index = self.search_index()
+            if index is not None and index.n_rows == self.n_rows and len(rows) >= SCAN_SELECTED * self.n_rows:
+                rows = rows[search_mask(self.texts, query, index)[rows]]
+            else:
+                rows = rows[search_mask(self.texts.iloc[rows], query)]
+        return rows
@@ -0,0 +1,195 @@
+"""
+Media manifest: the files of an export folder, listed once.
+
+One os.scandir pass records the name, size, mtime, extension and MIME type (sniffed
+from the first bytes, falling back to the extension) of every file. The manifest is
+stored in the chat cache directory and reused while the folder's own mtime is
+unchanged (adding, removing or renaming a file changes it), so a rerun costs one
+stat of the folder. The chat renderer resolves attachments with a dict lookup and
+never touches the filesystem, which matters on network-mounted export shares.
+
+A zipped export (chat_archive.ChatArchive) has a manifest of its members, checked
+against the archive's mtime and opened through the archive.
+"""
+
+from __future__ import annotations
+
+import json
+import mimetypes
+import os
+from typing import TYPE_CHECKING, BinaryIO, Callable, Dict, List, NamedTuple, Optional
+
+if TYPE_CHECKING:
+    from chat_archive import ChatArchive
+
+MEDIA_MANIFEST_FILE = "media-manifest.json"
+MEDIA_MANIFEST_VERSION = 1
+CHAT_FILE_SUFFIX = "_chat.txt"
+SNIFF_BYTES = 64
+
+# Attachment kinds by extension: how the chat view shows a file and what gets a preview
+AUDIO_EXTENSIONS = frozenset({".opus", ".mp3", ".wav", ".m4a", ".ogg"})
+VIDEO_EXTENSIONS = frozenset({".mp4", ".avi", ".mov", ".webm"})
+IMAGE_EXTENSIONS = frozenset({".jpg", ".jpeg", ".png", ".gif", ".webp"})
+
+
+class MediaFile(NamedTuple):
+    name: str
+    path: str  # For an archive member: the archive path joined with the name
+    size: int
+    mtime_ns: int
+    ext: str  # Lower case, with the dot
+    mime: str
+
+
+def sniff_mime(head: bytes, ext: str) -> str:
+    """MIME type from a file's first bytes; by extension when the signature is unknown."""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if head.startswith(b"RIFF"):
+        kind = head[8:12]
+        if kind == b"WEBP":
+            return "image/webp"
+        if kind == b"WAVE":
+            return "audio/wav"
+        if kind == b"AVI ":
+            return "video/x-msvideo"
+    if head.startswith(b"OggS"):
+        return "video/ogg" if b"theora" in head else "audio/ogg"  # Voice notes: Opus in Ogg
+    if head[4:8] == b"ftyp":
+        brand = head[8:12]
+        if brand in (b"M4A ", b"M4B "):
+            return "audio/mp4"
+        if brand == b"qt  ":
+            return "video/quicktime"
+        if brand in (b"heic", b"heix", b"mif1"):
+            return "image/heic"
+        return "video/mp4"
+    if head.startswith(b"\x1aE\xdf\xa3"):
+        return "video/webm"
+    if head.startswith(b"ID3") or (len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0):
+        return "audio/mpeg"
+    if head.startswith(b"%PDF"):
+        return "application/pdf"
+    return mimetypes.guess_type("x" + ext)[0] or "application/octet-stream"
+
+
+def _read_head(path: str) -> bytes:
+    try:
+        with open(path, "rb") as f:
+            return f.read(SNIFF_BYTES)
+    except OSError:
+        return b""
+
+
+class MediaManifest:
+    def __init__(self, media_dir: str, dir_mtime_ns: int, files: Dict[str, MediaFile],
+                 open_member: Optional[Callable[[str], BinaryIO]] = None):
+        self.media_dir = media_dir
+        self.dir_mtime_ns = dir_mtime_ns
+        self.files = files
+        # Opens a file by name when the files are archive members
+        self.open_member = open_member
+
+    @classmethod
+    def scan(cls, media_dir: str, previous: Optional["MediaManifest"] = None) -> "MediaManifest":
+        """List media_dir; files unchanged since `previous` keep their sniffed type."""
+        known = previous.files if previous is not None else {}
+        dir_mtime_ns = os.stat(media_dir).st_mtime_ns
+        files: Dict[str, MediaFile] = {}
+        with os.scandir(media_dir) as entries:
+            for entry in entries:
+                try:
+                    if not entry.is_file():
+                        continue  # Cache directory, nested folders
+                    st_ = entry.stat()
+                except OSError:
+                    continue
+                old = known.get(entry.name)
+                if old is not None and (old.size, old.mtime_ns) == (st_.st_size, st_.st_mtime_ns):
+                    files[entry.name] = old._replace(path=entry.path)
+                    continue
+                ext = os.path.splitext(entry.name)[1].lower()
+                files[entry.name] = MediaFile(
+                    entry.name, entry.path, st_.st_size, st_.st_mtime_ns, ext,
+                    sniff_mime(_read_head(entry.path), ext),
+                )
+        return cls(media_dir, dir_mtime_ns, files)
+
+    def get(self, name: str) -> Optional[MediaFile]:
+        return self.files.get(name)
+
+    def open(self, media_file: MediaFile) -> BinaryIO:
+        """Seekable binary stream of a file, from disk or from the archive."""
+        if self.open_member is not None:
+            return self.open_member(media_file.name)
+        return open(media_file.path, "rb")
+
+    def chat_files(self) -> List[str]:
+        return sorted(name for name in self.files if name.endswith(CHAT_FILE_SUFFIX))
+
+    def attachments(self) -> List[MediaFile]:
+        """Every file except the chat text itself."""
+        return [f for f in self.files.values() if not f.name.endswith(CHAT_FILE_SUFFIX)]
+
+    def to_json(self) -> dict:
+        return {
+            "version": MEDIA_MANIFEST_VERSION,
+            "dir_mtime_ns": self.dir_mtime_ns,
+            "files": [[f.name, f.size, f.mtime_ns, f.ext, f.mime] for f in self.files.values()],
+        }
+
+    @classmethod
+    def from_json(cls, media_dir: str, data: dict) -> Optional["MediaManifest"]:
+        if data.get("version") != MEDIA_MANIFEST_VERSION:
+            return None
+        files = {
+            name: MediaFile(name, os.path.join(media_dir, name), size, mtime_ns, ext, mime)
+            for name, size, mtime_ns, ext, mime in data["files"]
+        }
+        return cls(media_dir, data["dir_mtime_ns"], files)
+
+
+def read_media_manifest(media_dir: str, cache_dir: str) -> Optional[MediaManifest]:
+    try:
+        with open(os.path.join(cache_dir, MEDIA_MANIFEST_FILE), "r", encoding="utf-8") as f:
+            return MediaManifest.from_json(media_dir, json.load(f))
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def write_media_manifest(cache_dir: str, manifest: MediaManifest) -> None:
+    tmp_path = os.path.join(cache_dir, MEDIA_MANIFEST_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest.to_json(), f, ensure_ascii=False)
+    os.replace(tmp_path, os.path.join(cache_dir, MEDIA_MANIFEST_FILE))
+
+
+def load_media_manifest(media_dir: str, cache_dir: str, current: Optional[MediaManifest] = None,
+                        archive: Optional["ChatArchive"] = None) -> MediaManifest:
+    """Manifest of media_dir: `current` or the stored one while the folder mtime matches, else a rescan.
+
+    With an archive, media_dir is the archive's path and its members are listed.
+    """
+    dir_mtime_ns = os.stat(media_dir).st_mtime_ns
+    stored = current or read_media_manifest(media_dir, cache_dir)
+    if stored is not None and stored.dir_mtime_ns == dir_mtime_ns:
+        manifest = stored
+    else:
+        try:
+            # Created before the scan: a new cache directory changes the folder mtime
+            os.makedirs(cache_dir, exist_ok=True)
+        except OSError:
+            pass
+        manifest = archive.scan(stored) if archive is not None else MediaManifest.scan(media_dir, stored)
+        try:
+            write_media_manifest(cache_dir, manifest)
+        except OSError:
+            pass  # Read-only export location: rescanned on the next load
+    if archive is not None:
+        manifest.open_member = archive.open
+    return manifest
@@ -0,0 +1,233 @@
+"""
+Local HTTP server for chat media.
+
+The chat view references attachments by URL instead of inlining them as base64,
+so page size no longer depends on media size. Range requests are supported so the
+browser can stream audio/video and seek without downloading whole files.
+
+Media roots (export folders) are registered at runtime and addressed by an opaque
+token; only files directly inside a registered root are served. A zipped export is
+registered as an archive, and its members are served by name straight from the zip.
+With the root's media manifest, files are served with the type sniffed from their
+content, the one the chat view renders them as; otherwise by extension.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import hmac
+import mimetypes
+import os
+import re
+import secrets
+import threading
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING, BinaryIO, Dict, Optional, Tuple
+from urllib.parse import quote, unquote
+
+# Types the stdlib table doesn't know (or gets wrong) for WhatsApp exports
+mimetypes.add_type("audio/ogg", ".opus")
+mimetypes.add_type("audio/mp4", ".m4a")
+mimetypes.add_type("image/webp", ".webp")
+mimetypes.add_type("video/webm", ".webm")
+
+if TYPE_CHECKING:
+    from chat_archive import ChatArchive
+    from media_manifest import MediaManifest
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+COPY_CHUNK = 256 << 10
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Inclusive (start, end) for a single-range "bytes=..." header; None = whole file.
+
+    Raises ValueError for a range that cannot be satisfied.
+    """
+    if not header:
+        return None
+    m = RANGE_RE.match(header.strip())
+    if not m:
+        return None  # Multi-range or unknown unit: ignore and send the whole file
+    first, last = m.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError("empty suffix range")
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("range not satisfiable")
+    return start, end
+
+
+class MediaServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, public_url: Optional[str] = None):
+        self._roots: Dict[str, str] = {}
+        self._archives: Dict[str, "ChatArchive"] = {}
+        self._manifests: Dict[str, "MediaManifest"] = {}
+        self._secret = secrets.token_bytes(16)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._httpd.daemon_threads = True
+        if public_url:
+            self.base_url = public_url.rstrip("/")
+        else:
+            bound_host, bound_port = self._httpd.server_address[:2]
+            self.base_url = f"http://{bound_host}:{bound_port}"
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="media-server", daemon=True)
+
+    def start(self) -> "MediaServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _token(self, key: str) -> str:
+        # Stable for the lifetime of the process (browser caching), unguessable across processes
+        return hmac.new(self._secret, key.encode("utf-8"), hashlib.sha256).hexdigest()[:24]
+
+    def register(self, root: str, media: Optional["MediaManifest"] = None) -> str:
+        """Allow files directly inside `root` to be served; returns its URL token."""
+        root = os.path.realpath(root)
+        token = self._token(root)
+        with self._lock:
+            self._roots[token] = root
+            if media is not None:
+                self._manifests[token] = media
+        return token
+
+    def _archive_token(self, archive: "ChatArchive") -> str:
+        # Keyed by the archive's mtime too, so a replaced archive gets fresh URLs
+        return self._token(f"zip:{os.path.realpath(archive.path)}:{archive.mtime_ns}")
+
+    def register_archive(self, archive: "ChatArchive", media: Optional["MediaManifest"] = None) -> str:
+        """Allow the members of a zipped export to be served; returns its URL token."""
+        token = self._archive_token(archive)
+        with self._lock:
+            self._archives[token] = archive
+            if media is not None:
+                self._manifests[token] = media
+        return token
+
+    def unregister_archive(self, archive: "ChatArchive") -> None:
+        """Stop serving an archive before it is closed; a no-op unless it is the one registered."""
+        token = self._archive_token(archive)
+        with self._lock:
+            if self._archives.get(token) is archive:
+                del self._archives[token]
+                self._manifests.pop(token, None)
+
+    def content_type(self, token: str, filename: str) -> str:
+        """Sniffed type from the registered manifest, else guessed from the extension."""
+        with self._lock:
+            media = self._manifests.get(token)
+        media_file = media.get(filename) if media is not None else None
+        if media_file is not None:
+            return media_file.mime
+        return mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+    def url_for(self, token: str, filename: str) -> str:
+        return f"{self.base_url}/media/{token}/{quote(filename)}"
+
+    def resolve(self, token: str, filename: str) -> Optional[str]:
+        with self._lock:
+            root = self._roots.get(token)
+        if root is None or not filename or os.path.basename(filename) != filename:
+            return None
+        path = os.path.realpath(os.path.join(root, filename))
+        if os.path.dirname(path) != root or not os.path.isfile(path):
+            return None
+        return path
+
+    def open(self, token: str, filename: str) -> Optional[Tuple[BinaryIO, int]]:
+        """(seekable binary stream, size) of a registered file or archive member; None if unknown."""
+        with self._lock:
+            archive = self._archives.get(token)
+        if archive is not None:
+            size = archive.size(filename)
+            return None if size is None else (archive.open(filename), size)
+        path = self.resolve(token, filename)
+        if path is None:
+            return None
+        return open(path, "rb"), os.path.getsize(path)
+
+
+def _make_handler(server: MediaServer):
+    class MediaRequestHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_HEAD(self) -> None:
+            self._serve(send_body=False)
+
+        def do_GET(self) -> None:
+            self._serve(send_body=True)
+
+        def log_message(self, format: str, *args) -> None:
+            pass  # Keep the Streamlit console quiet
+
+        def _serve(self, send_body: bool) -> None:
+            parts = self.path.split("?", 1)[0].split("/")
+            # ["", "media", token, filename]
+            if len(parts) != 4 or parts[1] != "media":
+                self.send_error(HTTPStatus.NOT_FOUND)
+                return
+            filename = unquote(parts[3])
+            try:
+                opened = server.open(parts[2], filename)
+            except OSError:
+                opened = None
+            if opened is None:
+                self.send_error(HTTPStatus.NOT_FOUND)
+                return
+            f, size = opened
+            with f:
+                self._send(f, size, server.content_type(parts[2], filename), send_body)
+
+        def _send(self, f: BinaryIO, size: int, content_type: str, send_body: bool) -> None:
+            try:
+                byte_range = parse_range(self.headers.get("Range"), size)
+            except ValueError:
+                self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+            if byte_range is None:
+                start, end = 0, size - 1
+                self.send_response(HTTPStatus.OK)
+            else:
+                start, end = byte_range
+                self.send_response(HTTPStatus.PARTIAL_CONTENT)
+                self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+            length = max(0, end - start + 1)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(length))
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("Cache-Control", "private, max-age=3600")
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.end_headers()
+            if not send_body or length == 0:
+                return
+
+            try:
+                f.seek(start)
+                remaining = length
+                while remaining > 0:
+                    chunk = f.read(min(COPY_CHUNK, remaining))
+                    if not chunk:
+                        break
+                    self.wfile.write(chunk)
+                    remaining -= len(chunk)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # Browser cancelled (seek, scroll away) — normal for media
+
+    return MediaRequestHandler
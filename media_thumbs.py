@@ -0,0 +1,167 @@
+"""
+Thumbnail and poster-frame generation for chat media.
+
+Images are shrunk to small JPEG previews (Pillow) and videos get a poster frame
+(ffmpeg). Previews are written to a `.thumbs` directory keyed by a content hash of
+the source file, so they survive renames and are shared by every session. Work runs
+on a background thread pool: the chat view asks for a preview, gets None while it
+is being generated, and shows it on a later rerun.
+
+Both tools are optional — without them no previews are produced and the chat view
+falls back to the original files. Files inside a zipped export are read through an
+`open_file` callable; a video member is copied to a temporary file for ffmpeg.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Callable, Dict, Iterable, Optional, Set, Tuple
+
+from media_manifest import IMAGE_EXTENSIONS, VIDEO_EXTENSIONS
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional
+    Image = None
+
+THUMBS_DIR_NAME = ".thumbs"
+THUMB_SIZE = (320, 320)
+THUMB_QUALITY = 75
+HASH_SAMPLE_BYTES = 1 << 20
+
+
+def content_key(path: str, open_file: Optional[Callable[[], BinaryIO]] = None) -> str:
+    """Hash of the file size plus its first and last MB.
+
+    Exact for typical photos; for large videos it avoids reading the whole file
+    while still changing whenever the content is replaced.
+    """
+    with (open_file() if open_file else open(path, "rb")) as f:
+        size = f.seek(0, os.SEEK_END)
+        f.seek(0)
+        h = hashlib.sha256(str(size).encode("ascii"))
+        h.update(f.read(HASH_SAMPLE_BYTES))
+        if size > 2 * HASH_SAMPLE_BYTES:
+            f.seek(-HASH_SAMPLE_BYTES, os.SEEK_END)
+            h.update(f.read(HASH_SAMPLE_BYTES))
+        elif size > HASH_SAMPLE_BYTES:
+            h.update(f.read())
+    return h.hexdigest()[:32]
+
+
+def make_image_thumbnail(src, dst: str) -> None:
+    with Image.open(src) as img:
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail(THUMB_SIZE)
+        if img.mode not in ("RGB", "L"):
+            # Flatten transparency onto white, JPEG has no alpha
+            background = Image.new("RGB", img.size, (255, 255, 255))
+            rgba = img.convert("RGBA")
+            background.paste(rgba, mask=rgba.split()[-1])
+            img = background
+        img.save(dst, "JPEG", quality=THUMB_QUALITY, optimize=True)
+
+
+def make_video_poster(src: str, dst: str, ffmpeg: str) -> None:
+    # Frame at 1s (skips black intros); clips shorter than that use the first frame
+    for seek in ("1", "0"):
+        subprocess.run(
+            [ffmpeg, "-v", "error", "-y", "-ss", seek, "-i", src, "-frames:v", "1",
+             "-vf", f"scale='min({THUMB_SIZE[0]},iw)':-2", "-f", "image2", dst],
+            check=False, capture_output=True, timeout=60,
+        )
+        if os.path.exists(dst) and os.path.getsize(dst) > 0:
+            return
+    raise RuntimeError(f"ffmpeg could not extract a frame from {src}")
+
+
+class ThumbnailGenerator:
+    def __init__(self, max_workers: int = 2):
+        self.ffmpeg = shutil.which("ffmpeg")
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="thumbs")
+        self._lock = threading.Lock()
+        # (path, mtime_ns, size) -> preview file name (None if it failed), filled in by the workers
+        self._ready: Dict[Tuple[str, int, int], Optional[str]] = {}
+        self._pending: Set[Tuple[str, int, int]] = set()
+
+    def supports(self, filename: str) -> bool:
+        ext = os.path.splitext(filename)[1].lower()
+        if ext in IMAGE_EXTENSIONS:
+            return Image is not None
+        if ext in VIDEO_EXTENSIONS:
+            return self.ffmpeg is not None
+        return False
+
+    def thumbnail(self, path: str, thumbs_dir: str, stat: Optional[Tuple[int, int]] = None,
+                  open_file: Optional[Callable[[], BinaryIO]] = None) -> Optional[str]:
+        """File name (inside thumbs_dir) of the preview for `path`, or None if not ready.
+
+        `stat` is the file's (mtime_ns, size) when the caller already has it (from the
+        media manifest); a known preview is then answered without touching the disk.
+        `open_file` reads a file that is not on disk (an archive member; `stat` is then
+        required). Never blocks on file contents: hashing and generation are queued for
+        the background workers.
+        """
+        if not self.supports(path):
+            return None
+        if stat is None:
+            try:
+                st_ = os.stat(path)
+            except OSError:
+                return None
+            stat = (st_.st_mtime_ns, st_.st_size)
+        stamp = (path,) + tuple(stat)
+        with self._lock:
+            if stamp in self._ready:
+                return self._ready[stamp]
+            if stamp not in self._pending:
+                self._pending.add(stamp)
+                self._executor.submit(self._generate, path, stamp, thumbs_dir, open_file)
+        return None
+
+    def prefetch(self, files: Iterable[Tuple[str, Optional[Tuple[int, int]], Optional[Callable[[], BinaryIO]]]],
+                 thumbs_dir: str) -> None:
+        """Queue previews for every supported (path, stat, open_file) file, e.g. when a chat is opened."""
+        for path, stat, open_file in files:
+            self.thumbnail(path, thumbs_dir, stat, open_file)
+
+    def _generate(self, src: str, stamp: Tuple[str, int, int], thumbs_dir: str,
+                  open_file: Optional[Callable[[], BinaryIO]]) -> None:
+        name = None
+        try:
+            key = content_key(src, open_file)
+            dst = os.path.join(thumbs_dir, key + ".jpg")
+            if not os.path.exists(dst):
+                tmp = dst + ".tmp"
+                copy = dst + ".src"
+                try:
+                    os.makedirs(thumbs_dir, exist_ok=True)
+                    if os.path.splitext(src)[1].lower() in VIDEO_EXTENSIONS:
+                        if open_file is not None:
+                            # ffmpeg needs a seekable file on disk
+                            with open_file() as f, open(copy, "wb") as out:
+                                shutil.copyfileobj(f, out, 1 << 20)
+                        make_video_poster(copy if open_file else src, tmp, self.ffmpeg)
+                    elif open_file is not None:
+                        with open_file() as f:
+                            make_image_thumbnail(f, tmp)
+                    else:
+                        make_image_thumbnail(src, tmp)
+                    os.replace(tmp, dst)
+                finally:
+                    for leftover in (tmp, copy):
+                        if os.path.exists(leftover):
+                            os.remove(leftover)
+            name = key + ".jpg"
+        except Exception:
+            pass  # Corrupt/unsupported file or read-only folder: keep showing the original
+        finally:
+            with self._lock:
+                # Remembered even on failure, so a bad file isn't retried every rerun
+                self._ready[stamp] = name
+                self._pending.discard(stamp)
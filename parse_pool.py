@@ -0,0 +1,18 @@
+"""
+Entry point of the parallel parser's process pool:
+
+    python -m parse_pool <_chat.txt> <out.arrow> <workers, 0 for all CPUs>
+
+whatsapp_parser.parallel_parse_to_feather starts it as a separate interpreter, so
+the spawned workers import this module as their __main__ rather than the Streamlit
+app script. Prints the parse stats as JSON.
+"""
+
+import json
+import sys
+
+from whatsapp_parser import run_parse_pool
+
+if __name__ == "__main__":
+    chat_file_path, out_path, workers = sys.argv[1:]
+    json.dump(run_parse_pool(chat_file_path, out_path, int(workers) or None), sys.stdout)
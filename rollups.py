@@ -0,0 +1,180 @@
+"""
+Pre-aggregated message counts for the charts.
+
+ChatRollups is built once per loaded chat:
+
+- a dense daily cube, counts[day, user, is_system, is_media]
+- a sparse hourly cube of (day, hour, user, is_system) cells, stored as sorted keys
+  and counts; the day is the leading part of the key, so a date range is one slice
+
+The timeline (at an hourly to yearly resolution picked from the range it spans) and
+the weekday × hour heatmap for any participant and date selection are sums over cube
+slices. A text search cannot be answered from the cubes; the filtered rows are
+counted instead, from the day and hour kept for every row.
+"""
+
+from __future__ import annotations
+
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from filter_engine import FilterState
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+DAY = pd.Timedelta(days=1)
+# Timeline resolutions, finest first, and the most periods (bars) sent to the chart
+RESOLUTIONS = ["hour", "day", "week", "month", "year"]
+MAX_CHART_POINTS = 400
+
+
+class ChatRollups:
+    def __init__(self, df: pd.DataFrame):
+        users = df["user"].astype("category")
+        self.users = list(users.cat.categories)
+        codes = users.cat.codes.to_numpy().astype(np.int64)
+        is_system = df["is_system"].to_numpy(dtype=bool).astype(np.int64)
+        is_media = df["is_media"].to_numpy(dtype=bool).astype(np.int64)
+
+        stamps = df["timestamp"]
+        timed = stamps.notna().to_numpy()
+        days = stamps.dt.floor("D")
+        self.first_day = days.min() if timed.any() else pd.Timestamp(0)
+        self.n_days = int((days.max() - self.first_day) / DAY) + 1 if timed.any() else 0
+        # Day index and hour of every row (-1 without a timestamp)
+        self.row_day = np.where(timed, ((days - self.first_day) / DAY).fillna(-1).to_numpy(), -1).astype(np.int32)
+        self.row_hour = np.where(timed, stamps.dt.hour.fillna(-1).to_numpy(), -1).astype(np.int8)
+        # Calendar month of every day (year * 12 + month - 1), for monthly and yearly buckets
+        calendar = pd.date_range(self.first_day, periods=self.n_days, freq="D")
+        self.day_months = (calendar.year * 12 + calendar.month - 1).to_numpy().astype(np.int64)
+
+        n_users = len(self.users)
+        day, hour = self.row_day[timed].astype(np.int64), self.row_hour[timed].astype(np.int64)
+        user, system, media = codes[timed], is_system[timed], is_media[timed]
+        cells = ((day * n_users + user) * 2 + system) * 2 + media
+        self.daily = np.bincount(cells, minlength=self.n_days * n_users * 4).reshape(self.n_days, n_users, 2, 2)
+        self.hourly_keys, self.hourly_counts = np.unique(
+            ((day * 24 + hour) * n_users + user) * 2 + system, return_counts=True)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = [self.row_day, self.row_hour, self.day_months, self.daily, self.hourly_keys, self.hourly_counts]
+        return sum(a.nbytes for a in arrays)
+
+    def _day_span(self, date_range: Optional[Tuple[pd.Timestamp, pd.Timestamp]]) -> Optional[Tuple[int, int]]:
+        """Day indices [lo, hi) of a date range; None unless it covers whole days."""
+        if date_range is None:
+            return 0, self.n_days
+        start, end = (pd.Timestamp(t) for t in date_range)
+        end_day = (end + pd.Timedelta(milliseconds=1)).floor("D")
+        if start != start.floor("D") or end_day - end != pd.Timedelta(milliseconds=1):
+            return None
+        lo = int(np.clip((start - self.first_day) / DAY, 0, self.n_days))
+        hi = int(np.clip((end_day - self.first_day) / DAY, lo, self.n_days))
+        return lo, hi
+
+    def _user_mask(self, state: FilterState) -> np.ndarray:
+        if not state.users:
+            return np.ones(len(self.users), dtype=bool)
+        return np.isin(self.users, state.users)
+
+    def _from_cubes(self, state: FilterState) -> Optional[Tuple[int, int]]:
+        return None if state.query else self._day_span(state.date_range)
+
+    def _day_counts(self, state: FilterState, rows: np.ndarray) -> Tuple[np.ndarray, int]:
+        """(messages per day, index of the first of those days)."""
+        span = self._from_cubes(state)
+        if span is None:
+            return np.bincount(self._timed(rows, self.row_day), minlength=self.n_days), 0
+        lo, hi = span
+        systems = slice(None) if state.include_system else slice(0, 1)
+        return self.daily[lo:hi, self._user_mask(state), systems].sum(axis=(1, 2, 3)), lo
+
+    def _hour_cells(self, state: FilterState, rows: np.ndarray,
+                    ) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+        """(day, hour, count) of the selected hourly cells; count is None for one row per cell."""
+        span = self._from_cubes(state)
+        if span is None:
+            day = self._timed(rows, self.row_day).astype(np.int64)
+            return day, self._timed(rows, self.row_hour).astype(np.int64), None
+        # Cells of the selected days: keys are day-major
+        n_users = len(self.users)
+        lo, hi = np.searchsorted(self.hourly_keys, np.array(span, dtype=np.int64) * 24 * n_users * 2)
+        keys, counts = self.hourly_keys[lo:hi], self.hourly_counts[lo:hi]
+        rest, system = np.divmod(keys, 2)
+        rest, user = np.divmod(rest, n_users)
+        day, hour = np.divmod(rest, 24)
+        keep = self._user_mask(state)[user] & (state.include_system | (system == 0))
+        return day[keep], hour[keep], counts[keep]
+
+    def _bucket_ids(self, days: np.ndarray, resolution: str) -> np.ndarray:
+        """Bucket of each day index at a resolution coarser than an hour."""
+        if resolution == "day":
+            return days
+        if resolution == "week":
+            return (days + self.first_day.weekday()) // 7  # Weeks start on Monday
+        months = self.day_months[days]
+        return months if resolution == "month" else months // 12
+
+    def _bucket_starts(self, ids: np.ndarray, resolution: str) -> pd.DatetimeIndex:
+        if resolution == "day":
+            return self.first_day + pd.to_timedelta(ids, unit="D")
+        if resolution == "week":
+            return self.first_day + pd.to_timedelta(ids * 7 - self.first_day.weekday(), unit="D")
+        years, months = (ids, 0) if resolution == "year" else np.divmod(ids, 12)
+        return pd.DatetimeIndex(pd.to_datetime({"year": years, "month": months + 1, "day": 1}))
+
+    def timeline_counts(self, state: FilterState, rows: np.ndarray,
+                        max_points: int = MAX_CHART_POINTS) -> Tuple[pd.DataFrame, str]:
+        """Messages per period over the days that have messages: (columns period, messages; resolution).
+
+        The resolution is the finest of RESOLUTIONS with at most max_points periods
+        between the first and last active day. `rows` are the state's filtered rows,
+        only counted when the cubes cannot answer (a text search or a date range
+        not on day boundaries).
+        """
+        per_day, lo = self._day_counts(state, rows)
+        active = np.flatnonzero(per_day) + lo
+        if not len(active):
+            return pd.DataFrame({"period": pd.DatetimeIndex([]), "messages": np.zeros(0, dtype=np.int64)}), "day"
+        first, last = active[0], active[-1]
+        resolution = RESOLUTIONS[-1]
+        for candidate in RESOLUTIONS:
+            if candidate == "hour":
+                periods = (last - first + 1) * 24
+            else:
+                ends = self._bucket_ids(np.array([first, last]), candidate)
+                periods = ends[1] - ends[0] + 1
+            if periods <= max_points:
+                resolution = candidate
+                break
+
+        if resolution == "hour":
+            day, hour, counts = self._hour_cells(state, rows)
+            totals = np.bincount((day - first) * 24 + hour, weights=counts, minlength=int(periods))
+            ids = np.flatnonzero(totals)
+            periods = self.first_day + pd.to_timedelta(first, unit="D") + pd.to_timedelta(ids, unit="h")
+        else:
+            buckets = self._bucket_ids(np.arange(lo, lo + len(per_day)), resolution)
+            totals = np.bincount(buckets - buckets[0], weights=per_day)
+            ids = np.flatnonzero(totals)
+            periods = self._bucket_starts(ids + buckets[0], resolution)
+        return pd.DataFrame({"period": periods, "messages": totals[ids].astype(np.int64)}), resolution
+
+    def heatmap_counts(self, state: FilterState, rows: np.ndarray) -> pd.DataFrame:
+        """Messages per weekday and hour with any messages: columns Weekday, Hour, count."""
+        day, hour, counts = self._hour_cells(state, rows)
+        weekday = (day + self.first_day.weekday()) % 7
+        grid = np.bincount(weekday * 24 + hour, weights=counts, minlength=7 * 24).astype(np.int64)
+        cells = np.flatnonzero(grid)
+        return pd.DataFrame({
+            "Weekday": np.array(WEEKDAYS)[cells // 24],
+            "Hour": cells % 24,
+            "count": grid[cells],
+        })
+
+    @staticmethod
+    def _timed(rows: np.ndarray, per_row: np.ndarray) -> np.ndarray:
+        values = per_row[rows]
+        return values[values >= 0]
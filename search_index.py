@@ -0,0 +1,324 @@
+"""
+Inverted indexes for the chat search box.
+
+Every message is casefolded and indexed twice, both in CSR form (sorted keys, offsets,
+one flat postings array of ascending row numbers):
+
+- WordIndex maps each distinct word to the rows containing it.
+- TrigramIndex maps each run of three characters to the rows containing it, the way
+  code-search engines do, so any query of three or more characters (partial words,
+  emoji, URLs, punctuation) narrows to the rows holding all of its trigrams.
+
+A search intersects the candidates of both and checks only those rows against the
+full query. The check is never skipped: casefold() is full case folding (ß → ss,
+ﬁ → fi) while the RE2 check folds one character at a time, so the indexes find every
+row the check accepts but also some it rejects. Each index is a plain Arrow table (key, rows), so it can be stored next
+to the parsed chat cache and memory-mapped back.
+"""
+
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Runs of characters that are not part of a word (RE2 syntax, Unicode-aware)
+WORD_SEPARATOR_RE2 = r"[^\p{L}\p{M}\p{N}_]+"
+
+# How a query word may sit inside an indexed word: it is bounded on a side when the
+# query has a separator there (or the word is interior to the query)
+EXACT, PREFIX, SUFFIX, INFIX = "exact", "prefix", "suffix", "infix"
+
+# Trigrams are three code points (21 bits each) packed into one int64
+CODEPOINT_BITS = 21
+# Characters of text indexed at a time: each chunk's keys are deduplicated into a small
+# index before the next chunk is split, so build memory is bounded by the chunk size
+INDEX_CHUNK_CHARS = 2_000_000
+# Above this share of all rows, scanning every row beats narrowing and checking candidates
+DENSE_CANDIDATES = 0.25
+
+
+def casefold_texts(texts: pd.Series) -> pa.Array:
+    return pa.array(texts.str.casefold(), type=pa.large_string())
+
+
+def split_words(folded: pa.Array) -> Tuple[pa.Array, np.ndarray]:
+    """(words, row of each word) for casefolded texts; empty pieces are dropped."""
+    pieces = pc.split_pattern_regex(folded, pattern=WORD_SEPARATOR_RE2)
+    words = pc.list_flatten(pieces)
+    rows = pc.list_parent_indices(pieces).to_numpy()
+    keep = pc.greater(pc.utf8_length(words), 0)
+    return words.filter(keep), rows[keep.to_numpy(zero_copy_only=False)]
+
+
+def split_trigrams(folded: pa.Array) -> Tuple[pa.Array, np.ndarray]:
+    """(trigram keys, row of each key) for casefolded texts."""
+    lengths = pc.fill_null(pc.utf8_length(folded), 0).to_numpy()
+    _, offsets, data = folded.buffers()
+    if data is None or lengths.sum() < 3:
+        return pa.array([], pa.int64()), np.zeros(0, dtype=np.int32)
+    offsets = np.frombuffer(offsets, dtype=np.int64)[folded.offset:folded.offset + len(folded) + 1]
+    # Decode all texts at once: one code point per element, rows alongside
+    # Copy only these texts' bytes, not the whole parent buffer
+    utf8 = data.slice(offsets[0], offsets[-1] - offsets[0]).to_pybytes()
+    points = np.frombuffer(utf8.decode("utf-8").encode("utf-32-le"), dtype=np.uint32).astype(np.int64)
+    point_rows = np.repeat(np.arange(len(folded), dtype=np.int32), lengths)
+    inside = point_rows[:-2] == point_rows[2:]  # Trigram does not cross into the next row
+    packed = (points[:-2] << 2 * CODEPOINT_BITS) | (points[1:-1] << CODEPOINT_BITS) | points[2:]
+    return pa.array(packed[inside]), point_rows[:-2][inside]
+
+
+class PostingsIndex(ABC):
+    """Sorted keys with the ascending rows each occurs in; subclasses define the keys."""
+
+    KEY_COLUMN = "key"
+
+    def __init__(self, vocab: pa.Array, offsets: np.ndarray, postings: np.ndarray, n_rows: int):
+        self.vocab = vocab          # sorted, distinct keys
+        self.offsets = offsets      # postings of vocab[i] are postings[offsets[i]:offsets[i + 1]]
+        self.postings = postings    # row numbers, ascending within each key
+        self.n_rows = n_rows
+
+    @property
+    def nbytes(self) -> int:
+        return self.vocab.nbytes + self.offsets.nbytes + self.postings.nbytes
+
+    @staticmethod
+    @abstractmethod
+    def split(folded: pa.Array) -> Tuple[pa.Array, np.ndarray]:
+        """(keys, row of each key) for casefolded texts."""
+
+    @classmethod
+    def build(cls, texts: pd.Series) -> "PostingsIndex":
+        return cls.concat(cls._build_chunks(texts))
+
+    @classmethod
+    def _build_chunks(cls, texts: pd.Series) -> List["PostingsIndex"]:
+        """One small index per run of about INDEX_CHUNK_CHARS characters of text."""
+        if not len(texts):
+            return [cls._build_chunk(texts)]
+        ends = np.cumsum(texts.str.len().fillna(0).to_numpy(dtype=np.int64))
+        bounds = np.searchsorted(ends, np.arange(INDEX_CHUNK_CHARS, ends[-1] if len(ends) else 0, INDEX_CHUNK_CHARS))
+        bounds = np.unique(np.concatenate(([0], bounds + 1, [len(texts)])))
+        return [cls._build_chunk(texts.iloc[first:end]) for first, end in zip(bounds[:-1], bounds[1:])]
+
+    @classmethod
+    def _build_chunk(cls, texts: pd.Series) -> "PostingsIndex":
+        keys, rows = cls.split(casefold_texts(texts))
+        encoded = pc.dictionary_encode(keys)
+        vocab = encoded.dictionary
+        # Renumber the dictionary in sorted order so prefix ranges are contiguous
+        order = pc.array_sort_indices(vocab).to_numpy()
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        key_ids = rank[encoded.indices.to_numpy()]
+        vocab = vocab.take(pa.array(order))
+        del keys, encoded
+        # One (key, row) pair per occurrence; sort by key then row and drop repeats
+        n_rows = max(len(texts), 1)
+        pairs = key_ids * n_rows
+        pairs += rows
+        del key_ids, rows
+        pairs.sort()
+        if len(pairs):
+            pairs = pairs[np.concatenate(([True], pairs[1:] != pairs[:-1]))]
+        # Postings of key i are the pairs in [i * n_rows, (i + 1) * n_rows)
+        offsets = np.searchsorted(pairs, np.arange(len(vocab) + 1, dtype=np.int64) * n_rows)
+        pairs %= n_rows
+        return cls(vocab, offsets.astype(np.int64), pairs.astype(np.int32), len(texts))
+
+    @classmethod
+    def concat(cls, blocks: List["PostingsIndex"]) -> "PostingsIndex":
+        """One index over the blocks' rows laid end to end, each block after the previous one.
+
+        Keys without postings in any block are dropped.
+        """
+        if len(blocks) == 1 and (np.diff(blocks[0].offsets) > 0).all():
+            return blocks[0]
+        vocab = pc.unique(pa.concat_arrays([block.vocab for block in blocks])).sort()
+        block_ids = [pc.index_in(block.vocab, value_set=vocab).to_numpy() for block in blocks]
+        counts = np.zeros(len(vocab), dtype=np.int64)
+        for block, ids in zip(blocks, block_ids):
+            counts[ids] += np.diff(block.offsets)  # ids are distinct within a block
+        used = counts > 0
+        renumber = np.cumsum(used) - 1
+        offsets = np.concatenate(([0], np.cumsum(counts[used])))
+        postings = np.empty(offsets[-1], dtype=np.int32)
+        # Next free slot of each key; blocks are copied in row order, so rows stay ascending
+        fill = offsets[:-1].copy()
+        start = 0
+        for block, ids in zip(blocks, block_ids):
+            lengths = np.diff(block.offsets)
+            has = lengths > 0
+            ids, lengths = renumber[ids[has]], lengths[has]
+            slots = np.repeat(fill[ids] - block.offsets[:-1][has], lengths) + np.arange(len(block.postings))
+            postings[slots] = block.postings + start
+            fill[ids] += lengths
+            start += block.n_rows
+        return cls(vocab.filter(pa.array(used)), offsets, postings, start)
+
+    def truncate(self, n_rows: int) -> "PostingsIndex":
+        """This index restricted to rows [0, n_rows); keys may be left without postings."""
+        kept = self.postings < n_rows
+        key_ids = np.repeat(np.arange(len(self.vocab)), np.diff(self.offsets))
+        counts = np.bincount(key_ids[kept], minlength=len(self.vocab))
+        offsets = np.concatenate(([0], np.cumsum(counts)))
+        return type(self)(self.vocab, offsets, self.postings[kept], n_rows)
+
+    def extend(self, texts: pd.Series, start: int) -> "PostingsIndex":
+        """Index covering this index's rows [0, start) followed by `texts` from row `start` on."""
+        return type(self).concat([self.truncate(start)] + type(self)._build_chunks(texts))
+
+    def rows_for(self, key_ids: np.ndarray) -> np.ndarray:
+        """Boolean row mask: rows containing any of the given keys."""
+        starts, ends = self.offsets[key_ids], self.offsets[key_ids + 1]
+        lengths = ends - starts
+        # Positions of all postings of all keys, without a Python loop over the keys
+        positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        mask = np.zeros(self.n_rows, dtype=bool)
+        mask[self.postings[positions]] = True
+        return mask
+
+    # ==========================
+    # Storage
+    # ==========================
+
+    def to_table(self, metadata: Optional[Dict[str, str]] = None) -> pa.Table:
+        rows = pa.LargeListArray.from_arrays(pa.array(self.offsets, pa.int64()), pa.array(self.postings, pa.int32()))
+        table = pa.table({self.KEY_COLUMN: self.vocab, "rows": rows})
+        return table.replace_schema_metadata({**(metadata or {}), "n_rows": str(self.n_rows)})
+
+    @classmethod
+    def from_table(cls, table: pa.Table) -> "PostingsIndex":
+        rows = table.column("rows").combine_chunks()
+        offsets = rows.offsets.to_numpy()
+        postings = rows.values.to_numpy()
+        n_rows = int(table.schema.metadata[b"n_rows"])
+        return cls(table.column(cls.KEY_COLUMN).combine_chunks(), offsets - offsets[0], postings[offsets[0]:], n_rows)
+
+
+class WordIndex(PostingsIndex):
+    KEY_COLUMN = "word"
+    split = staticmethod(split_words)
+
+    def word_ids(self, word: str, mode: str = EXACT) -> np.ndarray:
+        """Vocabulary ids of the indexed words that `word` matches in the given mode."""
+        if mode == EXACT:
+            mask = pc.equal(self.vocab, word)
+        elif mode == PREFIX:
+            mask = pc.starts_with(self.vocab, word)
+        elif mode == SUFFIX:
+            mask = pc.ends_with(self.vocab, word)
+        else:
+            mask = pc.match_substring(self.vocab, word)
+        return np.flatnonzero(mask.to_numpy(zero_copy_only=False))
+
+    def lookup(self, word: str, mode: str = EXACT) -> np.ndarray:
+        """Boolean row mask for a word (EXACT) or word prefix (PREFIX) query."""
+        return self.rows_for(self.word_ids(word.casefold(), mode))
+
+    def candidates(self, query: str) -> Optional[np.ndarray]:
+        """Boolean mask of the rows that may contain `query` as a casefolded substring.
+
+        None if the query has no words to look up.
+        """
+        folded = query.casefold()
+        words, _ = split_words(pa.array([folded], type=pa.large_string()))
+        words = words.to_pylist()
+        if not words:
+            return None
+        # The first/last query word may continue into the surrounding text
+        open_start = folded.startswith(words[0])
+        open_end = folded.endswith(words[-1])
+        mask = None
+        for i, word in enumerate(words):
+            left_open = i == 0 and open_start
+            right_open = i == len(words) - 1 and open_end
+            mode = (INFIX if left_open and right_open else SUFFIX if left_open
+                    else PREFIX if right_open else EXACT)
+            rows = self.rows_for(self.word_ids(word, mode))
+            mask = rows if mask is None else mask & rows
+        return mask
+
+
+class TrigramIndex(PostingsIndex):
+    KEY_COLUMN = "trigram"
+    split = staticmethod(split_trigrams)
+
+    def candidates(self, query: str) -> Optional[np.ndarray]:
+        """Ascending rows holding every trigram of the casefolded query.
+
+        None if the query is shorter than a trigram or only has common trigrams.
+        """
+        keys, _ = split_trigrams(pa.array([query.casefold()], type=pa.large_string()))
+        if not len(keys):
+            return None
+        keys = np.unique(keys.to_numpy())
+        vocab = self.vocab.to_numpy()
+        ids = np.searchsorted(vocab, keys)
+        if (ids >= len(vocab)).any() or (vocab[np.minimum(ids, len(vocab) - 1)] != keys).any():
+            return np.zeros(0, dtype=np.int32)  # A trigram no message has
+        lists = sorted((self.postings[self.offsets[i]:self.offsets[i + 1]] for i in ids), key=len)
+        if len(lists[0]) > DENSE_CANDIDATES * self.n_rows:
+            return None  # Every trigram is common: the intersection would not narrow much
+        rows = lists[0]
+        # Intersect from the shortest list: binary search each survivor in the next list
+        for other in lists[1:]:
+            if not len(rows):
+                break
+            at = np.minimum(np.searchsorted(other, rows), len(other) - 1)
+            rows = rows[other[at] == rows]
+        return rows
+
+
+class SearchIndex:
+    """Word and trigram indexes over the same rows."""
+
+    def __init__(self, words: WordIndex, trigrams: TrigramIndex):
+        self.words = words
+        self.trigrams = trigrams
+
+    @property
+    def n_rows(self) -> int:
+        return self.words.n_rows
+
+    @property
+    def nbytes(self) -> int:
+        return self.words.nbytes + self.trigrams.nbytes
+
+    @classmethod
+    def build(cls, texts: pd.Series) -> "SearchIndex":
+        return cls(WordIndex.build(texts), TrigramIndex.build(texts))
+
+    def candidates(self, query: str) -> Optional[np.ndarray]:
+        """Ascending rows that may contain `query`; None if neither index helps."""
+        mask = self.words.candidates(query)
+        rows = self.trigrams.candidates(query)
+        if rows is None:
+            return None if mask is None else np.flatnonzero(mask)
+        if mask is not None:
+            rows = rows[mask[rows]]
+        return rows
+
+
+def contains_ignore_case(texts: pa.Array, query: str) -> np.ndarray:
+    # RE2 case-insensitive literal match: same folding as the old rx.IGNORECASE scan
+    return pc.match_substring(texts, query, ignore_case=True).to_numpy(zero_copy_only=False)
+
+
+def search_mask(texts: pd.Series, query: str, index: Optional[SearchIndex] = None) -> np.ndarray:
+    """Boolean mask of rows whose text contains `query`, ignoring case."""
+    if index is not None and index.n_rows == len(texts):
+        rows = index.candidates(query)
+        if rows is not None and len(rows) <= DENSE_CANDIDATES * len(texts):
+            # Check the full query against the candidate rows only
+            candidates = pa.array(texts.iloc[rows], type=pa.large_string())
+            rows = rows[contains_ignore_case(candidates, query)]
+            mask = np.zeros(len(texts), dtype=bool)
+            mask[rows] = True
+            return mask
+    return contains_ignore_case(pa.array(texts, type=pa.large_string()), query)
@@ -0,0 +1,119 @@
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import chat_cache
+from chat_cache import (
+    MAX_CACHE_PARTS,
+    TRIGRAM_INDEX_FILE,
+    WORD_INDEX_FILE,
+    ChatCacheManager,
+    cache_dir_for,
+    check_chat_cache,
+    load_chat_frame,
+    read_cache_manifest,
+)
+
+# A message continued on the next line sits on several cuts, so appends reparse it
+LINES = []
+for i in range(400):
+    LINES.append(f"{1 + i // 60:02d}.03.2024, {i % 24:02d}:{i % 60:02d} - {['Anna', 'Борис', 'Chen'][i % 3]}: message {i}")
+    if i % 7 == 0:
+        LINES.append(f"continued line {i} привет")
+    if i % 50 == 0:
+        LINES.append(f"{1 + i // 60:02d}.03.2024, {i % 24:02d}:{i % 60:02d} - Anna added Chen")
+CHAT = ("\n".join(LINES) + "\n").encode("utf-8")
+
+
+def same_index(a, b):
+    return (a.vocab.equals(b.vocab) and np.array_equal(a.offsets, b.offsets)
+            and np.array_equal(a.postings, b.postings) and a.n_rows == b.n_rows)
+
+
+def load(path):
+    df, load_index, summary, how = load_chat_frame(str(path))
+    return df, load_index(), summary, how
+
+
+@pytest.mark.parametrize("n_appends", [1, MAX_CACHE_PARTS + 2])  # The second one compacts the parts
+def test_appended_cache_equals_full_reparse(tmp_path, n_appends):
+    appended = tmp_path / "appended" / "_chat.txt"
+    appended.parent.mkdir()
+    # Cuts at line ends, like a re-export; one between a message and its continuation
+    # line makes the last cached message continue in the appended bytes
+    cuts = [CHAT.rindex(b"\n", 0, len(CHAT) * (k + 1) // (n_appends + 1)) + 1 for k in range(n_appends)]
+    cuts = [CHAT.index(b"\ncontinued") + 1] + cuts[1:] + [len(CHAT)]
+    appended.write_bytes(CHAT[:cuts[0]])
+    assert load(appended)[3] == "parsed"
+    for cut in cuts[1:]:
+        appended.write_bytes(CHAT[:cut])
+        assert load(appended)[3] == "appended"
+    assert len(read_cache_manifest(cache_dir_for(str(appended)))["parts"]) <= MAX_CACHE_PARTS
+
+    full = tmp_path / "full" / "_chat.txt"
+    full.parent.mkdir()
+    full.write_bytes(CHAT)
+    df_full, index_full, summary_full, how = load(full)
+    assert how == "parsed"
+
+    for reload in (load(appended), load(appended)):  # Appended, then reopened from the cache
+        df, index, summary, _ = reload
+        pd.testing.assert_frame_equal(df, df_full)
+        assert summary == summary_full
+        assert same_index(index.words, index_full.words)
+        assert same_index(index.trigrams, index_full.trigrams)
+
+
+def test_search_index_is_built_when_first_loaded(tmp_path):
+    path = tmp_path / "_chat.txt"
+    path.write_bytes(CHAT)
+    cache_dir = cache_dir_for(str(path))
+    index_files = [os.path.join(cache_dir, name) for name in (WORD_INDEX_FILE, TRIGRAM_INDEX_FILE)]
+    df, load_index, _, how = load_chat_frame(str(path))
+    assert how == "parsed" and not any(os.path.exists(f) for f in index_files)
+    assert load_index().n_rows == len(df)
+    assert all(os.path.exists(f) for f in index_files)
+
+
+def test_touched_export_is_hashed_once_for_summary_and_load(tmp_path, monkeypatch):
+    path = tmp_path / "_chat.txt"
+    path.write_bytes(CHAT)
+    load(path)
+    st_ = os.stat(path)
+    os.utime(path, ns=(st_.st_atime_ns, st_.st_mtime_ns + 10**9))  # Copied again: same bytes, new mtime
+    hashes = []
+    hash_file = chat_cache.hash_file
+    monkeypatch.setattr(chat_cache, "hash_file", lambda p: hashes.append(p) or hash_file(p))
+
+    checked = check_chat_cache(str(path))
+    assert checked.valid and checked.summary is not None
+    assert load_chat_frame(str(path), checked=checked)[3] == "cached"
+    assert len(hashes) == 1
+
+
+def test_chat_cache_manager_unloads_least_recently_viewed():
+    manager = ChatCacheManager(max_bytes=250)
+    for name in ("a", "b", "c"):
+        manager.get(name).update(chat=SimpleNamespace(df=None, nbytes=100), summary={})
+        manager.fit(name)
+    # "c" pushed the total over budget: "a", viewed longest ago, was unloaded
+    assert manager.loaded() == ["b", "c"]
+    assert manager.get("a") == {"summary": {}}
+    assert manager.total_bytes == 200
+
+    manager.get("b")  # Viewing "b" again makes "c" the least recent
+    manager.get("a")["chat"] = SimpleNamespace(df=None, nbytes=100)
+    assert manager.fit("a") == ["c"]
+    assert manager.loaded() == ["b", "a"]
+
+
+def test_chat_cache_manager_keeps_the_viewed_chat_over_budget():
+    manager = ChatCacheManager(max_bytes=0)
+    manager.get("a")["chat"] = SimpleNamespace(df=None, nbytes=100)
+    assert manager.fit("a") == []
+    manager.get("b")["chat"] = SimpleNamespace(df=None, nbytes=100)
+    assert manager.fit("b") == ["a"]
+    assert manager.loaded() == ["b"]
@@ -0,0 +1,81 @@
+import gc
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import chat_cache
+from chat_cache import ChatRegistry, LoadedChat, chat_source_key, load_chat, load_chat_frame
+
+CHAT = "".join(f"02.03.2024, 10:{i % 60:02d} - {'Anna' if i % 2 else 'Борис'}: message {i}\n" for i in range(2000))
+
+
+def write_chat(tmp_path):
+    path = tmp_path / "_chat.txt"
+    path.write_text(CHAT, encoding="utf-8")
+    return str(path)
+
+
+def start_together(target, n):
+    threads = [threading.Thread(target=target) for _ in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_registry_loads_a_key_once_for_concurrent_callers(tmp_path):
+    path = write_chat(tmp_path)
+    registry, loads, results = ChatRegistry(), [], []
+
+    def load():
+        loads.append(1)
+        time.sleep(0.2)  # Long enough for the other callers to arrive
+        return load_chat(path)
+
+    start_together(lambda: results.append(registry.get_or_load(chat_source_key(path), load)), 4)
+    assert len(loads) == 1
+    assert sorted(shared for _, shared in results) == [False, True, True, True]
+    assert len({id(chat) for chat, _ in results}) == 1
+
+
+def test_registry_drops_chats_no_session_holds(tmp_path):
+    path = write_chat(tmp_path)
+    registry = ChatRegistry()
+    chat, shared = registry.get_or_load(chat_source_key(path), lambda: load_chat(path))
+    assert not shared and isinstance(chat, LoadedChat) and len(registry) == 1
+    del chat
+    gc.collect()
+    assert len(registry) == 0
+
+
+def test_concurrent_loads_parse_once_across_threads(tmp_path, monkeypatch):
+    path = write_chat(tmp_path)
+    builds, modes = [], []
+    build = chat_cache.build_chat_cache
+
+    def counting_build(*args, **kwargs):
+        builds.append(1)
+        time.sleep(0.2)
+        return build(*args, **kwargs)
+
+    monkeypatch.setattr(chat_cache, "build_chat_cache", counting_build)
+    start_together(lambda: modes.append(load_chat_frame(path)[3]), 3)
+    assert len(builds) == 1
+    assert sorted(modes) == ["cached", "cached", "parsed"]
+
+
+def test_concurrent_loads_parse_once_across_processes(tmp_path):
+    path = write_chat(tmp_path)
+    script = (
+        "import sys; sys.path.insert(0, sys.argv[1]); from chat_cache import load_chat_frame; "
+        "print(load_chat_frame(sys.argv[2])[3])"
+    )
+    root = os.path.dirname(os.path.abspath(chat_cache.__file__))
+    procs = [subprocess.Popen([sys.executable, "-c", script, root, path], stdout=subprocess.PIPE, text=True)
+             for _ in range(3)]
+    modes = sorted(proc.communicate()[0].strip() for proc in procs)
+    assert all(proc.returncode == 0 for proc in procs)
+    assert modes == ["cached", "cached", "parsed"]
+    assert load_chat_frame(path)[0]["text"].tolist() == [f"message {i}" for i in range(2000)]
@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+
+from filter_engine import FilterEngine
+
+
+def frame(timestamps):
+    n = len(timestamps)
+    return pd.DataFrame({
+        "text": [f"message {i}" for i in range(n)],
+        "user": ["Anna", "Борис"] * (n // 2) + ["Anna"] * (n % 2),
+        "timestamp": pd.to_datetime(pd.Series(timestamps)),
+        "is_system": False,
+    })
+
+
+def test_time_order_matches_sorting_the_filtered_rows():
+    df = frame(["2024-03-05", None, "2024-03-01", "2024-03-03", "2024-03-02", None, "2024-03-04", "2024-03-06"])
+    engine = FilterEngine(df)
+    for users in ([], ["Anna"], ["Борис"]):
+        rows = engine.select(users=users)
+        fdf = df.iloc[rows]
+        order = engine.time_order_of(rows)
+        expected = fdf.sort_values("timestamp", kind="stable").reset_index(drop=True)
+        pd.testing.assert_frame_equal(fdf.iloc[order].reset_index(drop=True), expected)
+
+
+def test_time_ordered_chat_needs_no_reordering():
+    engine = FilterEngine(frame(["2024-03-01", "2024-03-01", "2024-03-02"]))
+    assert engine.time_order_of(np.array([0, 2])) is None
@@ -0,0 +1,56 @@
+import os
+import zipfile
+
+import pytest
+
+from chat_archive import ChatArchive
+from media_server import MediaServer
+
+
+@pytest.fixture
+def server():
+    server = MediaServer().start()
+    yield server
+    server.stop()
+
+
+def write_zip(path, data):
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("_chat.txt", "01.02.2024, 10:00 - Anna: photo\n")
+        zf.writestr("photo.jpg", data)
+
+
+def test_unregistered_archive_is_no_longer_served(server, tmp_path):
+    path = tmp_path / "export.zip"
+    write_zip(path, b"old")
+    old = ChatArchive(str(path))
+    token = server.register_archive(old)
+    f, size = server.open(token, "photo.jpg")
+    with f:
+        assert f.read() == b"old" and size == 3
+
+    write_zip(path, b"new bytes")
+    os.utime(path, ns=(old.mtime_ns + 10**9, old.mtime_ns + 10**9))
+    assert not old.is_current()
+    new = ChatArchive(str(path))
+    new_token = server.register_archive(new)
+    server.unregister_archive(old)
+    old.close()
+    assert server.open(token, "photo.jpg") is None
+    f, size = server.open(new_token, "photo.jpg")
+    with f:
+        assert f.read() == b"new bytes"
+    new.close()
+
+
+def test_unregister_leaves_another_sessions_archive(server, tmp_path):
+    path = tmp_path / "export.zip"
+    write_zip(path, b"data")
+    mine, theirs = ChatArchive(str(path)), ChatArchive(str(path))
+    server.register_archive(mine)
+    token = server.register_archive(theirs)  # Same file and version: same token
+    server.unregister_archive(mine)
+    f, _ = server.open(token, "photo.jpg")
+    f.close()
+    mine.close()
+    theirs.close()
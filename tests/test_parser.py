@@ -0,0 +1,41 @@
+import pandas as pd
+import pyarrow.feather as feather
+
+import whatsapp_parser
+from whatsapp_parser import parallel_parse_to_feather, parse_datetime_column, run_parse_pool, stream_parse_to_feather
+
+CHAT = "\n".join(
+    [f"01.02.2024, 10:{i % 60:02d} - {'Anna' if i % 3 else 'Борис'}: message {i}" for i in range(300)]
+    + ["01.02.2024, 11:00 - Anna: first line", "continued line", "01.02.2024, 11:01 - Messages are end-to-end encrypted."]
+) + "\n"
+
+
+def test_parallel_parse_matches_stream_parse(tmp_path):
+    chat = tmp_path / "_chat.txt"
+    chat.write_text(CHAT, encoding="utf-8")
+    parallel = parallel_parse_to_feather(str(chat), str(tmp_path / "parallel.arrow"), workers=2)
+    stream = stream_parse_to_feather(str(chat), str(tmp_path / "stream.arrow"))
+    assert parallel == stream
+    assert feather.read_table(tmp_path / "parallel.arrow").equals(feather.read_table(tmp_path / "stream.arrow"))
+
+
+def test_ambiguous_dates_read_day_first_when_dotted_month_first_when_slashed():
+    ts, n_fallback = parse_datetime_column(pd.Series(["05.03.2024, 10:00", "06.03.2024, 11:00"]))
+    assert n_fallback == 0
+    assert list(ts) == [pd.Timestamp("2024-03-05 10:00"), pd.Timestamp("2024-03-06 11:00")]
+    ts, _ = parse_datetime_column(pd.Series(["05/03/2024, 10:00"]))
+    assert list(ts) == [pd.Timestamp("2024-05-03 10:00")]
+
+
+def test_serial_and_parallel_parse_agree_on_late_disambiguated_dates(tmp_path, monkeypatch):
+    # Slashed dates stay ambiguous until day 13, near the end of the file
+    lines = [f"{1 + i // 200:02d}/03/2024, 10:{i % 60:02d} - Anna: message {i}" for i in range(3000)]
+    chat = tmp_path / "_chat.txt"
+    chat.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    monkeypatch.setattr(whatsapp_parser, "PARALLEL_MIN_CHUNK_BYTES", 4096)
+    parallel = run_parse_pool(str(chat), str(tmp_path / "parallel.arrow"), workers=2)
+    stream = stream_parse_to_feather(str(chat), str(tmp_path / "stream.arrow"), batch_size=500)
+    assert parallel == stream and stream["datetime_format"].startswith("%d/%m")
+    table = feather.read_table(tmp_path / "stream.arrow")
+    assert table.equals(feather.read_table(tmp_path / "parallel.arrow"))
+    assert table.column("timestamp")[0].as_py() == pd.Timestamp("2024-03-01 10:00")
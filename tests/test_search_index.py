@@ -0,0 +1,110 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+import search_index
+from filter_engine import FilterEngine
+from search_index import CODEPOINT_BITS, SearchIndex, TrigramIndex, WordIndex, search_mask, split_trigrams
+
+# Texts whose case folding differs between str.casefold() and RE2's ignore_case
+FOLDING_TEXTS = [
+    "Die Straße ist lang",
+    "STRASSE",
+    "ẞ capital sharp s",
+    "ﬁne ligature",
+    "fine",
+    "Σίσυφος",
+    "ΣΊΣΥΦΟΣ",
+    "ſtop long s",
+    "İstanbul",
+    "istanbul",
+    "Kelvin K sign",
+    "Привет, МИР",
+]
+# Enough other rows that the candidates stay under the dense threshold and the index is used
+TEXTS = pd.Series(FOLDING_TEXTS + [f"filler message {i}" for i in range(200)])
+
+QUERIES = ["strasse", "straße", "STRASSE", "ss", "ß", "fine", "ﬁne", "fi", "σίσυφος", "ς", "ΣΟΣ",
+           "stop", "ſt", "istanbul", "i̇", "k", "kelvin", "привет", "мир", "ße ist", "e s", "message 1"]
+
+
+@pytest.fixture(scope="module")
+def index():
+    return SearchIndex.build(TEXTS)
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_index_matches_scan(index, query):
+    assert np.array_equal(search_mask(TEXTS, query, index), search_mask(TEXTS, query))
+
+
+@pytest.mark.parametrize("query", ["strasse", "straße", "ss", "fine"])
+def test_filter_engine_rows_do_not_depend_on_selection(index, query):
+    df = pd.DataFrame({
+        "text": TEXTS,
+        "user": ["A"] * len(FOLDING_TEXTS) + ["B"] * (len(TEXTS) - len(FOLDING_TEXTS)),
+        "timestamp": pd.Timestamp("2024-01-01"),
+        "is_system": False,
+    })
+    engine = FilterEngine(df, index)
+    everyone = set(engine.select(query=query))  # Index path
+    only_a = set(engine.select(users=["A"], query=query))  # Few selected rows: scan path
+    assert {r for r in everyone if r < len(FOLDING_TEXTS)} == only_a
+
+
+def test_filter_engine_loads_index_on_first_query(index):
+    df = pd.DataFrame({"text": TEXTS, "user": "A", "timestamp": pd.Timestamp("2024-01-01"), "is_system": False})
+    loaded = threading.Event()
+
+    def load_index():
+        loaded.set()
+        return index
+
+    engine = FilterEngine(df, load_index=load_index)
+    assert engine.index is None and not loaded.is_set()  # Not built with the engine
+    scanned = engine.select(query="straße")  # Starts the load, scans meanwhile
+    assert loaded.wait(5)
+    for _ in range(100):
+        if engine.index is index:
+            break
+        time.sleep(0.01)
+    assert engine.index is index
+    assert np.array_equal(engine.select(query="straße"), scanned)
+
+
+def test_trigrams_match_per_row():
+    texts = [t.casefold() for t in TEXTS[:40]]
+    folded = pa.array(["skipped"] + texts, type=pa.large_string()).slice(1)  # Non-zero array offset
+    keys, rows = split_trigrams(folded)
+    expected = [
+        ((ord(t[i]) << 2 * CODEPOINT_BITS) | (ord(t[i + 1]) << CODEPOINT_BITS) | ord(t[i + 2]), row)
+        for row, t in enumerate(texts) for i in range(len(t) - 2)
+    ]
+    assert list(zip(keys.to_pylist(), rows.tolist())) == expected
+
+
+def assert_same_index(a, b):
+    assert a.vocab.equals(b.vocab)
+    assert np.array_equal(a.offsets, b.offsets)
+    assert np.array_equal(a.postings, b.postings)
+    assert a.n_rows == b.n_rows
+
+
+@pytest.mark.parametrize("index_cls", [WordIndex, TrigramIndex])
+def test_chunked_build_matches_single_chunk(monkeypatch, index_cls):
+    whole = index_cls.build(TEXTS)
+    monkeypatch.setattr(search_index, "INDEX_CHUNK_CHARS", 40)
+    assert len(index_cls._build_chunks(TEXTS)) > 10
+    assert_same_index(index_cls.build(TEXTS), whole)
+
+
+@pytest.mark.parametrize("index_cls", [WordIndex, TrigramIndex])
+def test_extend_matches_build(monkeypatch, index_cls):
+    monkeypatch.setattr(search_index, "INDEX_CHUNK_CHARS", 100)
+    # The old index saw a different version of the rows from 100 on
+    old = index_cls.build(pd.concat([TEXTS[:100], pd.Series(["replaced Straße row"] * 30)], ignore_index=True))
+    assert_same_index(old.extend(TEXTS[100:].reset_index(drop=True), 100), index_cls.build(TEXTS))
@@ -0,0 +1,672 @@
+"""
+Parsing of WhatsApp chat exports (_chat.txt) into ChatLine records and DataFrames.
+
+Kept free of Streamlit so it can be imported by worker processes and benchmarks.
+"""
+
+from __future__ import annotations
+
+import json
+import multiprocessing
+import os
+import re
+import subprocess
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import chain, islice
+from typing import BinaryIO, Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import regex as rx
+from dateutil import parser as dtparser
+
+from filter_engine import FilterEngine
+from search_index import SearchIndex
+
+# ==========================
+# Parsing Logic
+# ==========================
+# WhatsApp exports have two common shapes:
+#  A) Android:  "DD.MM.YYYY, HH:MM - Name: Message"
+#  B) iOS:      "[DD.MM.YYYY, HH:MM] Name: Message"  or "DD/MM/YY, HH:MM - Name: Message"
+#  Plus 12h/AM-PM variants and different separators.
+#  Multiline messages: subsequent lines do not start with a timestamp prefix.
+
+# Precompile multiple timestamp regexes (EN/RU tolerant)
+# We capture: datetime string, then user, then message
+
+# New format: [10/1/25, 11:58:38] ~Gulmira: message
+# Note: Handle invisible Unicode characters like \u200e
+NEW_BRACKET_RE = rx.compile(
+    r"^[\u200e]*\[(?P<dt>\d{1,2}/\d{1,2}/\d{2,4},?\s+\d{1,2}:\d{2}:\d{2})\]\s+(?P<user>[^:]+):\s+(?P<msg>.*)$"
+)
+
+# Media attachment format: [10/1/25, 12:02:23] ~Gulmira: ‎<attached: filename>
+# Note: Handle invisible Unicode characters like \u200e
+MEDIA_ATTACHMENT_RE = rx.compile(
+    r"^[\u200e]*\[(?P<dt>\d{1,2}/\d{1,2}/\d{2,4},?\s+\d{1,2}:\d{2}:\d{2})\]\s+(?P<user>[^:]+):\s+[\u200e]*<attached:\s+(?P<filename>[^>]+)>$"
+)
+
+# Original Android format: "01.01.2024, 12:34 - Name: message"
+ANDROID_RE = rx.compile(
+    r"^(?P<dt>\d{1,2}[./]\d{1,2}[./]\d{2,4},?\s+\d{1,2}:\d{2}(?:\s*[APap][Mm])?)\s+-\s+(?P<user>[^:]+):\s+(?P<msg>.*)$"
+)
+
+# Original iOS bracket format: "[01.01.2024, 12:34] Name: message"
+IOS_BRACKET_RE = rx.compile(
+    r"^\[(?P<dt>\d{1,2}[.//]\d{1,2}[.//]\d{2,4},?\s+\d{1,2}:\d{2}(?:\s*[APap][Mm])?)\]\s+(?P<user>[^:]+):\s+(?P<msg>.*)$"
+)
+
+# Generic format fallback
+GENERIC_RE = rx.compile(
+    r"^(?P<dt>\d{1,2}[.//]\d{1,2}[.//]\d{2,4},?\s+\d{1,2}:\d{2}(?:\s*[APap][Mm])?)\s+-\s+(?P<user>[^:]+):\s+(?P<msg>.*)$"
+)
+
+# System messages
+SYSTEM_LINE_RE = rx.compile(
+    # Lines like: "01.01.2024, 12:34 - Messages to this group are now secured with end-to-end encryption."
+    r"^(?P<dt>\d{1,2}[.//]\d{1,2}[.//]\d{2,4},?\s+\d{1,2}:\d{2}(?:\s*[APap][Mm])?)\s+-\s+(?P<msg>.+)$"
+)
+
+# Dialect lock-in. An export is written in one layout, so instead of trying every
+# regex above on every line, the head of the file is sampled once and each line is
+# classified with a single combined pattern for that layout. The cascade above is
+# still used for the rare header-looking lines the locked pattern rejects, so the
+# result is identical to trying all patterns in order.
+
+# Android/generic user + system lines in one pattern: the optional user group is
+# tried first, which is the same order as ANDROID_RE/GENERIC_RE → SYSTEM_LINE_RE
+DASH_RE = rx.compile(
+    r"^(?P<dt>\d{1,2}[./]\d{1,2}[./]\d{2,4},?\s+\d{1,2}:\d{2}(?:\s*[APap][Mm])?)\s+-\s+(?:(?P<user>[^:]+):\s+)?(?P<msg>.*)$"
+)
+
+DIALECTS = {
+    "bracket_seconds": NEW_BRACKET_RE,  # [10/1/25, 11:58:38] Name: message
+    "bracket": IOS_BRACKET_RE,  # [01.01.2024, 12:34] Name: message
+    "dash": DASH_RE,  # 01.01.2024, 12:34 - Name: message
+}
+
+DIALECT_SAMPLE_LINES = 500
+
+# Every header pattern starts with one of these; anything else is a continuation
+HEADER_FIRST_CHARS = frozenset("[\u200e0123456789")
+
+MEDIA_MARKERS = {
+    "<Media omitted>",  # EN Android/iOS
+    "<Медиафайл опущен>",  # RU
+    "<Arquivo de mídia omitido>",  # PT
+    "<Archivo omitido>",  # ES
+    "<attached:",  # New format media attachments
+}
+# One alternation instead of a substring test per marker
+MEDIA_MARKERS_RE = re.compile("|".join(re.escape(mark) for mark in sorted(MEDIA_MARKERS)))
+
+@dataclass
+class ChatLine:
+    dt_raw: str
+    user: Optional[str]
+    text: str
+    is_system: bool
+
+
+def parse_datetime(s: str) -> Optional[pd.Timestamp]:
+    # Try month-first parsing primarily for MM/DD/YY format; fallback to day-first
+    for dayfirst in (False, True):
+        try:
+            return pd.to_datetime(dtparser.parse(s, dayfirst=dayfirst))
+        except Exception:
+            pass
+    return None
+
+
+# Timestamp layout detection. An export uses one date layout throughout, so it is
+# detected once from a sample of the dt strings and the whole column is then parsed
+# with a single pd.to_datetime(format=...) call. Only rows that do not fit the
+# detected layout go through the (slow, per-row) dateutil path above.
+DT_PARTS_RE = rx.compile(
+    r"^(?P<a>\d{1,2})(?P<sep>[./])(?P<b>\d{1,2})[./](?P<year>\d{2,4}),?\s+\d{1,2}:\d{2}(?P<sec>:\d{2})?(?:\s*(?P<ampm>[APap][Mm]))?$"
+)
+
+
+def normalize_dt_strings(raw: pd.Series) -> pd.Series:
+    # "1/2/24, 3:45PM" -> "1/2/24 3:45 PM" so one strptime format fits every row
+    return (
+        raw.str.replace(r"[,\s]+", " ", regex=True)
+        .str.replace(r"\s*([APap][Mm])$", r" \1", regex=True)
+    )
+
+
+def infer_datetime_format(samples: Iterable[str]) -> Optional[str]:
+    """Detect the strptime format of an export's timestamps from a sample.
+
+    Day-first vs month-first is decided over the whole sample: a first field above
+    12 can only be a day, a second field above 12 can only be a day. If the sample
+    never disambiguates, dotted dates are read day-first (Android, EU/RU locales) and
+    slashed dates month-first (iOS EN exports). parse_datetime, by contrast, reads any
+    ambiguous date month-first, so "05.03.2024" is 5 March here but 3 May there.
+    """
+    layouts: Counter = Counter()
+    first_is_day = second_is_day = 0
+    for sample in samples:
+        m = DT_PARTS_RE.match(sample)
+        if not m:
+            continue
+        layouts[(m.group("sep"), len(m.group("year")), bool(m.group("sec")), bool(m.group("ampm")))] += 1
+        first_is_day += int(m.group("a")) > 12
+        second_is_day += int(m.group("b")) > 12
+    if not layouts:
+        return None
+
+    sep, year_len, has_sec, has_ampm = layouts.most_common(1)[0][0]
+    if first_is_day or second_is_day:
+        dayfirst = first_is_day >= second_is_day
+    else:
+        dayfirst = sep == "."
+    date_fmt = sep.join(["%d", "%m"] if dayfirst else ["%m", "%d"])
+    date_fmt += sep + ("%Y" if year_len == 4 else "%y")
+    time_fmt = ("%I" if has_ampm else "%H") + ":%M" + (":%S" if has_sec else "") + (" %p" if has_ampm else "")
+    return f"{date_fmt} {time_fmt}"
+
+
+def parse_datetime_column(raw: pd.Series, fmt: Optional[str] = None) -> Tuple[pd.Series, int]:
+    """Parse a column of raw dt strings; returns (timestamps, rows that needed dateutil)."""
+    if fmt is None:
+        fmt = infer_datetime_format(raw.head(10_000))
+    if fmt is not None:
+        ts = pd.to_datetime(normalize_dt_strings(raw), format=fmt, errors="coerce")
+    else:
+        ts = pd.Series(pd.NaT, index=raw.index, dtype="datetime64[ns]")
+
+    # Orphan lines have no dt string at all — nothing to fall back on
+    failed = ts.isna() & (raw != "")
+    n_fallback = int(failed.sum())
+    if n_fallback:
+        ts = ts.astype("datetime64[ns]")
+        ts[failed] = pd.to_datetime(raw[failed].map(parse_datetime))
+    return ts, n_fallback
+
+
+def iter_lines(text: str) -> Iterable[str]:
+    # Normalize Windows newlines
+    for line in text.splitlines():
+        yield line.strip("\ufeff\ufeff\ufeff\n\r ")
+
+
+def iter_file_lines(f: BinaryIO, chunk_size: int = 1 << 20, limit: Optional[int] = None) -> Iterator[str]:
+    """Streaming counterpart of iter_lines: read a binary file in fixed-size chunks.
+
+    Only the current chunk and one partial line are held in memory. Each physical
+    line is passed through splitlines() so the result matches iter_lines exactly.
+    If limit is given, at most that many bytes are read from the current position.
+    """
+    remainder = b""
+    while True:
+        if limit is not None:
+            if limit <= 0:
+                break
+            chunk = f.read(min(chunk_size, limit))
+            limit -= len(chunk)
+        else:
+            chunk = f.read(chunk_size)
+        if not chunk:
+            break
+        parts = (remainder + chunk).split(b"\n")
+        remainder = parts.pop()
+        for part in parts:
+            yield from _split_decoded(part)
+    if remainder:
+        yield from _split_decoded(remainder)
+
+
+def _split_decoded(raw_line: bytes) -> Iterator[str]:
+    pieces = raw_line.decode("utf-8").splitlines() or [""]
+    for piece in pieces:
+        yield piece.strip("\ufeff\ufeff\ufeff\n\r ")
+
+
+def detect_dialect(sample: Iterable[str]) -> Optional[str]:
+    """Return the DIALECTS key matching most header lines in the sample, if any."""
+    hits: Counter = Counter()
+    for raw in sample:
+        if not raw or raw[0] not in HEADER_FIRST_CHARS:
+            continue
+        for name, pattern in DIALECTS.items():
+            if pattern.match(raw):
+                hits[name] += 1
+                break
+    return hits.most_common(1)[0][0] if hits else None
+
+
+def _match_header_cascade(raw: str) -> Optional[Tuple[str, Optional[str], str]]:
+    # Try new format first, then fall back to original formats
+    m = (NEW_BRACKET_RE.match(raw) or 
+         MEDIA_ATTACHMENT_RE.match(raw) or 
+         ANDROID_RE.match(raw) or 
+         IOS_BRACKET_RE.match(raw) or 
+         GENERIC_RE.match(raw))
+    if m:
+        # Handle media attachments
+        if "filename" in m.groupdict() and m.group("filename"):
+            return m.group("dt"), m.group("user"), f"<attached: {m.group('filename')}>"
+        return m.group("dt"), m.group("user"), m.group("msg")
+
+    # System message line (no user)
+    m = SYSTEM_LINE_RE.match(raw)
+    if m:
+        return m.group("dt"), None, m.group("msg")
+    return None
+
+
+def match_header(raw: str, locked: Optional[rx.Pattern] = None) -> Optional[Tuple[str, Optional[str], str]]:
+    """Classify a non-empty line: (dt, user or None for system, msg), or None for a continuation."""
+    if raw[0] not in HEADER_FIRST_CHARS:
+        return None
+    if locked is not None:
+        m = locked.match(raw)
+        if m:
+            return m.group("dt"), m.group("user"), m.group("msg")
+    return _match_header_cascade(raw)
+
+
+def iter_chat_lines(lines: Iterable[str], dialect: Optional[str] = None) -> Iterator[ChatLine]:
+    """Yield ChatLine records as soon as the next header line finishes them.
+
+    The dialect is detected from the first DIALECT_SAMPLE_LINES lines unless given.
+    """
+    lines = iter(lines)
+    if dialect is None:
+        head = list(islice(lines, DIALECT_SAMPLE_LINES))
+        dialect = detect_dialect(head)
+        lines = chain(head, lines)
+    locked = DIALECTS.get(dialect) if dialect else None
+    current: Optional[ChatLine] = None
+
+    for raw in lines:
+        if not raw:
+            # Empty line — append to current message as newline
+            if current is not None:
+                current.text += "\n"
+            continue
+
+        header = match_header(raw, locked)
+        if header:
+            # Commit previous
+            if current is not None:
+                yield current
+            dt_str, user, msg = header
+            if user is None:
+                current = ChatLine(dt_raw=dt_str, user=None, text=msg, is_system=True)
+            else:
+                current = ChatLine(dt_raw=dt_str, user=user.strip(), text=msg, is_system=False)
+            continue
+
+        # Continuation of previous message
+        if current is None:
+            # Orphan line without header — treat as system without date
+            current = ChatLine(dt_raw="", user=None, text=raw, is_system=True)
+        else:
+            current.text += ("\n" if current.text else "") + raw
+
+    if current is not None:
+        yield current
+
+
+def parse_whatsapp_export(txt: str) -> List[ChatLine]:
+    return list(iter_chat_lines(iter_lines(txt)))
+
+
+def iter_batches(records: Iterable[ChatLine], batch_size: int) -> Iterator[List[ChatLine]]:
+    batch: List[ChatLine] = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# ==========================
+# DataFrame Utilities
+# ==========================
+
+def to_dataframe(lines: List[ChatLine], dt_format: Optional[str] = None) -> pd.DataFrame:
+    df = pd.DataFrame({
+        "dt_raw": [ln.dt_raw for ln in lines],
+        "user": [(ln.user or "—system—").strip() for ln in lines],
+        "text": [ln.text or "" for ln in lines],
+        "is_system": pd.array([ln.is_system for ln in lines], dtype=bool),
+    })
+
+    # Parse timestamps (format detected from this frame unless given)
+    if dt_format is None:
+        dt_format = infer_datetime_format(df["dt_raw"].head(10_000))
+    df["timestamp"], n_fallback = parse_datetime_column(df["dt_raw"], dt_format)
+    df.attrs["datetime_format"] = dt_format
+    df.attrs["timestamp_fallback_rows"] = n_fallback
+    # Some orphan/system lines may have None — we'll handle this properly
+
+    # Basic derived fields - only for valid timestamps (NaT gives missing values)
+    ts = df["timestamp"].dt
+    df["date"] = ts.normalize().astype("datetime64[ms]")
+    df["hour"] = ts.hour.astype("Int8")
+    df["weekday"] = ts.weekday.astype("Int8")  # 0 = Monday
+
+    # Media flag (heuristic)
+    df["is_media"] = df["text"].str.contains(MEDIA_MARKERS_RE)
+
+    # Compact layout: few distinct senders, and the raw dt strings are no longer needed
+    df["user"] = df["user"].astype("category")
+    return df.drop(columns="dt_raw")
+
+
+# Fixed Arrow layout of to_dataframe() output, so that record batches built from
+# different slices of a chat (e.g. one with no parsable timestamps) line up.
+# Users are stored as plain strings (each record batch would otherwise carry its own
+# dictionary) and dictionary-encoded again by frame_from_arrow().
+MESSAGE_SCHEMA = pa.schema([
+    ("user", pa.large_string()),
+    ("text", pa.large_string()),
+    ("is_system", pa.bool_()),
+    ("timestamp", pa.timestamp("ns")),
+    ("date", pa.date32()),
+    ("hour", pa.int8()),
+    ("weekday", pa.int8()),
+    ("is_media", pa.bool_()),
+])
+
+# Arrow -> pandas types that to_pandas() would otherwise widen (int8 with nulls -> float64)
+_PANDAS_TYPES = {pa.int8(): pd.Int8Dtype()}
+
+
+def to_arrow(df: pd.DataFrame) -> pa.Table:
+    return pa.Table.from_pandas(df, schema=MESSAGE_SCHEMA, preserve_index=False)
+
+
+def frame_from_arrow(table: pa.Table) -> pd.DataFrame:
+    """The to_dataframe() layout for a MESSAGE_SCHEMA table (e.g. a memory-mapped cache).
+
+    Text stays in Arrow string storage; users become a Categorical.
+    """
+    users = table.column("user")
+    if not pa.types.is_dictionary(users.type):
+        table = table.set_column(table.schema.get_field_index("user"), "user", pc.dictionary_encode(users))
+    return table.to_pandas(date_as_object=False, types_mapper=_PANDAS_TYPES.get)
+
+
+def memory_report(df: pd.DataFrame) -> pd.DataFrame:
+    """Per-column memory use: dtype, total MB and bytes per message."""
+    usage = df.memory_usage(index=False, deep=True)
+    rows = max(len(df), 1)
+    report = pd.DataFrame({
+        "dtype": [str(df[col].dtype) for col in usage.index],
+        "MB": usage.to_numpy() / 2**20,
+        "bytes/message": usage.to_numpy() / rows,
+    }, index=usage.index)
+    report.loc["total"] = ["", report["MB"].sum(), report["bytes/message"].sum()]
+    return report
+
+
+def chat_summary(df: pd.DataFrame) -> dict:
+    """Chat metadata for the sidebar and the unfiltered KPI row, JSON-serialisable.
+
+    participants lists every sender with the number of their dated, non-system
+    messages; days and media count the same messages (what the default filters show).
+    first/last_timestamp span all dated rows, as the date picker does.
+    """
+    stamps = df["timestamp"]
+    shown = (~df["is_system"] & (df["user"] != "—system—") & stamps.notna()).to_numpy(dtype=bool)
+    senders = df["user"][df["user"] != "—system—"]
+    counts = df["user"][shown].value_counts()
+    first, last = stamps.min(), stamps.max()
+    return {
+        "participants": {u: int(counts.get(u, 0)) for u in sorted(senders.unique().tolist())},
+        "messages": int(shown.sum()),
+        "days": int(df["date"][shown].nunique()),
+        "media": int(df["is_media"][shown].sum()),
+        "first_timestamp": None if pd.isna(first) else first.isoformat(),
+        "last_timestamp": None if pd.isna(last) else last.isoformat(),
+    }
+
+
+def filter_df(
+    df: pd.DataFrame,
+    users: Optional[List[str]] = None,
+    date_range: Optional[Tuple[pd.Timestamp, pd.Timestamp]] = None,
+    query: str = "",
+    include_system: bool = False,
+    index: Optional[SearchIndex] = None,
+) -> pd.DataFrame:
+    """Rows of df passing the filters; see FilterEngine for repeated filtering of one frame."""
+    return df.iloc[FilterEngine(df, index).select(users, date_range, query, include_system)]
+
+
+# ==========================
+# Parsing to Feather
+# ==========================
+# Parsed chats are written as uncompressed Arrow IPC (Feather v2) files in record
+# batches, so the cache can be memory-mapped later without a decode pass.
+
+STREAM_BATCH_SIZE = 50_000
+# Timestamps are sampled at evenly spaced places of the file, not only at its start:
+# day/month order is often only settled by a day above 12 later in the chat
+DT_SAMPLE_OFFSETS = 8
+DT_SAMPLE_LINES = 2_000
+
+
+def sample_dt_strings(f: BinaryIO, dialect: Optional[str],
+                      n_offsets: int = DT_SAMPLE_OFFSETS, lines_per_offset: int = DT_SAMPLE_LINES) -> List[str]:
+    """Header dt strings from evenly spaced offsets of a seekable stream, which is left rewound."""
+    locked = DIALECTS.get(dialect) if dialect else None
+    size = f.seek(0, os.SEEK_END)
+    samples: List[str] = []
+    for k in range(n_offsets):
+        offset = size * k // n_offsets
+        f.seek(offset)
+        if offset:
+            f.readline()  # Finish the line the offset falls in
+        for raw in islice(iter_file_lines(f, chunk_size=64 << 10), lines_per_offset):
+            header = match_header(raw, locked) if raw else None
+            if header:
+                samples.append(header[0])
+    f.seek(0)
+    return samples
+
+
+def detect_stream_layout(f: BinaryIO) -> Tuple[Optional[str], Optional[str]]:
+    """(dialect, datetime format) of a seekable export stream, which is left rewound.
+
+    Every way of parsing a file (streamed, in parallel ranges, in memory) uses this, so
+    each reads its timestamps the same way.
+    """
+    dialect = detect_dialect(islice(iter_file_lines(f), DIALECT_SAMPLE_LINES))
+    f.seek(0)
+    return dialect, infer_datetime_format(sample_dt_strings(f, dialect))
+
+
+def write_records(
+    records: Iterable[ChatLine],
+    out_path: str,
+    dt_format: Optional[str] = None,
+    batch_size: int = STREAM_BATCH_SIZE,
+) -> dict:
+    """Convert ChatLine records to the MESSAGE_SCHEMA layout batch by batch.
+
+    If dt_format is None it is detected on the first batch and reused for the rest.
+    Returns parse stats (rows, datetime_format, timestamp_fallback_rows).
+    """
+    stats = {"rows": 0, "datetime_format": dt_format, "timestamp_fallback_rows": 0}
+    with pa.OSFile(out_path, "wb") as sink, pa.ipc.new_file(sink, MESSAGE_SCHEMA) as writer:
+        for batch in iter_batches(records, batch_size):
+            if stats["datetime_format"] is None:
+                stats["datetime_format"] = infer_datetime_format(ln.dt_raw for ln in batch)
+            frame = to_dataframe(batch, dt_format=stats["datetime_format"])
+            writer.write_table(to_arrow(frame))
+            stats["rows"] += len(batch)
+            stats["timestamp_fallback_rows"] += frame.attrs["timestamp_fallback_rows"]
+    return stats
+
+
+def stream_parse_to_feather(chat_file_path: str, out_path: str, batch_size: int = STREAM_BATCH_SIZE) -> dict:
+    """Parse _chat.txt into a Feather file with memory independent of the file size."""
+    with open(chat_file_path, "rb") as f:
+        return parse_stream_to_feather(f, out_path, batch_size)
+
+
+def parse_stream_to_feather(f: BinaryIO, out_path: str, batch_size: int = STREAM_BATCH_SIZE) -> dict:
+    """stream_parse_to_feather for an open binary stream (e.g. a zip member); it must be seekable."""
+    dialect, dt_format = detect_stream_layout(f)
+    # dialect "" means "no dialect found" — don't re-detect
+    records = iter_chat_lines(iter_file_lines(f), dialect=dialect or "")
+    stats = write_records(records, out_path, dt_format=dt_format, batch_size=batch_size)
+    stats["dialect"] = dialect
+    return stats
+
+
+def iter_range_records(path: str, start: int, end: int, dialect: Optional[str]) -> Iterator[ChatLine]:
+    """Records in bytes [start, end) of an export; start must be a header line start."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        yield from iter_chat_lines(iter_file_lines(f, limit=end - start), dialect=dialect or "")
+
+
+def find_last_header_offset(path: str, end: int, dialect: Optional[str], block_size: int = 64 << 10) -> int:
+    """Byte offset of the last line before `end` that starts a message (0 if none).
+
+    Reads backwards from `end` in blocks, so it only touches the tail of the file.
+    """
+    locked = DIALECTS.get(dialect) if dialect else None
+    with open(path, "rb") as f:
+        pos, carry = end, b""
+        while pos > 0:
+            start = max(0, pos - block_size)
+            f.seek(start)
+            lines = (f.read(pos - start) + carry).split(b"\n")
+            offsets = [start]
+            for line in lines[:-1]:
+                offsets.append(offsets[-1] + len(line) + 1)
+            # lines[0] may be cut off by the block start unless we reached the file start
+            first_complete = 0 if start == 0 else 1
+            for i in range(len(lines) - 1, first_complete - 1, -1):
+                piece = next(_split_decoded(lines[i]))
+                if piece and match_header(piece, locked):
+                    return offsets[i]
+            pos, carry = start, lines[0]
+    return 0
+
+
+# ==========================
+# Parallel Parsing
+# ==========================
+# Large exports are split into byte ranges that each start on a message header, so
+# no message spans two ranges and each range parses exactly as it would inside the
+# whole file. Workers parse their range (timestamps and derived columns included)
+# into a part file; the parts are then stitched together in order.
+#
+# The pool runs in a child interpreter started on the parse_pool module: spawned
+# workers import their parent's __main__, which in the app is the Streamlit script
+# (it would run again in every worker), and swapping sys.modules["__main__"] while
+# other sessions' threads run is not safe.
+
+PARALLEL_MIN_BYTES = 64 << 20  # Below this, worker start-up costs more than it saves
+PARALLEL_MIN_CHUNK_BYTES = 8 << 20
+
+
+def _first_line_piece(raw_line: bytes) -> str:
+    if raw_line.endswith(b"\n"):
+        raw_line = raw_line[:-1]
+    return next(_split_decoded(raw_line))
+
+
+def find_message_boundaries(path: str, n_chunks: int, dialect: Optional[str]) -> List[int]:
+    """Byte offsets [0, ..., size] cutting the file into up to n_chunks ranges at header lines."""
+    size = os.path.getsize(path)
+    locked = DIALECTS.get(dialect) if dialect else None
+    bounds = [0]
+    with open(path, "rb") as f:
+        for k in range(1, n_chunks):
+            target = size * k // n_chunks
+            if target <= bounds[-1]:
+                continue
+            # Finish the line containing target-1, i.e. land on a line start >= target
+            f.seek(target - 1)
+            f.readline()
+            while True:
+                pos = f.tell()
+                line = f.readline()
+                if not line:
+                    pos = size
+                    break
+                piece = _first_line_piece(line)
+                if piece and match_header(piece, locked):
+                    break
+            if pos >= size:
+                break
+            bounds.append(pos)
+    bounds.append(size)
+    return bounds
+
+
+def parse_range_to_feather(path: str, start: int, end: int, dialect: Optional[str], dt_format: Optional[str], out_path: str) -> dict:
+    """Worker: parse bytes [start, end) of the export into a Feather part file."""
+    return write_records(iter_range_records(path, start, end, dialect), out_path, dt_format=dt_format)
+
+
+def parallel_parse_to_feather(chat_file_path: str, out_path: str, workers: Optional[int] = None) -> dict:
+    """Parse _chat.txt with a process pool; same output and stats as stream_parse_to_feather.
+
+    Raises RuntimeError if the pool's interpreter fails.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [here, os.environ.get("PYTHONPATH")])))
+    result = subprocess.run(
+        [sys.executable, "-m", "parse_pool", chat_file_path, out_path, str(workers or 0)],
+        env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Parallel parse failed: {result.stderr.strip()[-2000:]}")
+    return json.loads(result.stdout)
+
+
+def run_parse_pool(chat_file_path: str, out_path: str, workers: Optional[int] = None) -> dict:
+    """parallel_parse_to_feather in this process; its __main__ must be safe to import."""
+    workers = workers or os.cpu_count() or 1
+    size = os.path.getsize(chat_file_path)
+
+    with open(chat_file_path, "rb") as f:
+        dialect, dt_format = detect_stream_layout(f)
+    n_chunks = max(1, min(workers * 4, size // PARALLEL_MIN_CHUNK_BYTES))
+    bounds = find_message_boundaries(chat_file_path, n_chunks, dialect)
+
+    part_paths = [f"{out_path}.part{i}" for i in range(len(bounds) - 1)]
+    stats = {"rows": 0, "datetime_format": dt_format, "timestamp_fallback_rows": 0, "dialect": dialect}
+    try:
+        # spawn everywhere: forking a multi-threaded Streamlit server is not safe
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(workers, len(part_paths)), mp_context=ctx) as pool:
+            futures = [
+                pool.submit(parse_range_to_feather, chat_file_path, start, end, dialect, dt_format, part)
+                for start, end, part in zip(bounds[:-1], bounds[1:], part_paths)
+            ]
+            for future in futures:
+                part_stats = future.result()
+                stats["rows"] += part_stats["rows"]
+                stats["timestamp_fallback_rows"] += part_stats["timestamp_fallback_rows"]
+
+        # Stitch the parts in file order
+        with pa.OSFile(out_path, "wb") as sink, pa.ipc.new_file(sink, MESSAGE_SCHEMA) as writer:
+            for part in part_paths:
+                with pa.memory_map(part) as source:
+                    reader = pa.ipc.open_file(source)
+                    for i in range(reader.num_record_batches):
+                        writer.write_batch(reader.get_batch(i))
+    finally:
+        for part in part_paths:
+            if os.path.exists(part):
+                os.remove(part)
+    return stats
+
@@ -7,7 +7,7 @@ Features (v0.1):
 - Interactive filters: by date range, participants, and full‑text search
 - Quick stats: total messages, per‑person counts, media count
 - Visualizations:
-    • Messages over time (daily)
+    • Messages over time (hourly to yearly, by the range shown)
     • Activity heatmap (weekday × hour)
 - Message explorer table with filters
 
@@ -15,7 +15,7 @@ How to run locally:
 1) Create a virtual environment and install deps:
    python -m venv .venv && .venv/Scripts/activate  (Windows)
    # or: source .venv/bin/activate  (macOS/Linux)
-   pip install -U streamlit pandas numpy python-dateutil altair regex
+   pip install -U streamlit pandas numpy pyarrow python-dateutil altair regex
 
 2) Start the app:
    streamlit run whatsapp_viz_app.py
@@ -41,27 +41,46 @@ from __future__ import annotations
 
 import base64
 import os
-import re
 import sys
-from dataclasses import dataclass
-from typing import Iterable, List, Optional, Tuple
+from collections import OrderedDict
+from datetime import date
+from functools import partial
+from typing import BinaryIO, Callable, Optional, Tuple
+from urllib.parse import urlsplit
 
 import altair as alt
 import numpy as np
 import pandas as pd
-import regex as rx
-from dateutil import parser as dtparser
 import streamlit as st
 import streamlit.components.v1 as components
 
+from chat_archive import ChatArchive, is_chat_archive
+from chat_cache import (
+    CacheCheck,
+    ChatCacheManager,
+    ChatRegistry,
+    chat_source_key,
+    check_chat_cache,
+    export_cache_dir,
+    load_chat,
+)
+from chat_render import ChatRenderer
+from chat_view import chat_window
+from filter_engine import FilterEngine, FilterState
+from rollups import WEEKDAYS
+from media_manifest import MediaFile, MediaManifest, load_media_manifest
+from media_server import MediaServer
+from media_thumbs import THUMBS_DIR_NAME, ThumbnailGenerator
+from whatsapp_parser import memory_report
+
 # ==========================
 # Utility Functions
 # ==========================
 
-def get_file_base64(file_path: str) -> str:
-    """Convert file to base64 string for embedding in HTML"""
+def get_file_base64(file_path: str, open_file: Optional[Callable[[], BinaryIO]] = None) -> str:
+    """Convert file to base64 string for embedding in HTML (open_file reads it from an archive)"""
     try:
-        with open(file_path, 'rb') as f:
+        with (open_file() if open_file else open(file_path, 'rb')) as f:
             data = f.read()
             # Check if file is not empty
             if len(data) == 0:
@@ -72,190 +91,243 @@ def get_file_base64(file_path: str) -> str:
         st.error(f"Error reading file {file_path}: {str(e)}")
         return ""
 
+
+class MediaEncodingCache:
+    """LRU of base64-encoded attachments, bounded by the total size of the encodings.
+
+    Keyed by path + mtime + size, so each attachment is read and encoded at most once
+    per session (and again only if the file changes).
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+
+    def get(self, file_path: str, stat: Optional[Tuple[int, int]] = None,
+            open_file: Optional[Callable[[], BinaryIO]] = None) -> str:
+        """Base64 of the file; `stat` is its (mtime_ns, size) if already known."""
+        if stat is None:
+            try:
+                st_ = os.stat(file_path)
+            except OSError:
+                return get_file_base64(file_path)  # Reports the error
+            stat = (st_.st_mtime_ns, st_.st_size)
+        key = (file_path,) + tuple(stat)
+        encoded = self._entries.get(key)
+        if encoded is not None:
+            self._entries.move_to_end(key)
+            return encoded
+
+        encoded = get_file_base64(file_path, open_file)
+        if encoded and len(encoded) <= self.max_bytes:
+            self._entries[key] = encoded
+            self.total_bytes += len(encoded)
+            while self.total_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.total_bytes -= len(evicted)
+        return encoded
+
+
+MEDIA_ENCODING_CACHE_BYTES = 256 << 20
+
+
+def get_media_encoding_cache() -> MediaEncodingCache:
+    if 'media_encoding_cache' not in st.session_state:
+        st.session_state.media_encoding_cache = MediaEncodingCache(MEDIA_ENCODING_CACHE_BYTES)
+    return st.session_state.media_encoding_cache
+
+
+# Media delivery: "http" serves attachments by URL from a local media server
+# (streamed with range requests); "inline" embeds them as base64 data URIs.
+# WHATSAPP_VIZ_MEDIA_URL is the server's address as seen by the browser, needed
+# when the app is reached through another host name or a reverse proxy. "auto"
+# uses http when that address is set or the browser is on this machine, since
+# only then can it reach the server, and inline otherwise.
+MEDIA_MODE = os.environ.get("WHATSAPP_VIZ_MEDIA_MODE", "auto")
+LOOPBACK_HOSTS = {"localhost", "127.0.0.1", "::1"}
+
+
+def media_over_http() -> bool:
+    """Whether this session's attachments are served by the media server."""
+    if MEDIA_MODE != "auto":
+        return MEDIA_MODE == "http"
+    if os.environ.get("WHATSAPP_VIZ_MEDIA_URL"):
+        return True
+    try:
+        host = st.context.headers.get("Host") or ""
+    except Exception:
+        return False  # No browser request (bare mode)
+    return urlsplit("//" + host).hostname in LOOPBACK_HOSTS
+
+
+@st.cache_resource
+def get_media_server() -> Optional[MediaServer]:
+    """One media server per Streamlit process; None if it cannot be started."""
+    try:
+        return MediaServer(
+            host=os.environ.get("WHATSAPP_VIZ_MEDIA_HOST", "127.0.0.1"),
+            port=int(os.environ.get("WHATSAPP_VIZ_MEDIA_PORT", "0")),
+            public_url=os.environ.get("WHATSAPP_VIZ_MEDIA_URL"),
+        ).start()
+    except (OSError, ValueError):
+        return None
+
+
+@st.cache_resource
+def get_thumbnail_generator() -> ThumbnailGenerator:
+    """Background preview generator shared by all sessions of this process."""
+    return ThumbnailGenerator()
+
+
+def thumbs_dir_for(media_dir: str) -> str:
+    return os.path.join(export_cache_dir(media_dir), THUMBS_DIR_NAME)
+
+
+def member_opener(media: MediaManifest, media_file: MediaFile) -> Optional[Callable[[], BinaryIO]]:
+    """Reader for a file of a zipped export; None for a file on disk."""
+    return partial(media.open, media_file) if media.open_member is not None else None
+
+
+def thumbnail_src(media_file: MediaFile, media: MediaManifest, thumbs_dir: str, thumbs_token: Optional[str]) -> str:
+    """URL (media server) or data URI (inline mode) of a ready preview image; "" until it is generated."""
+    name = get_thumbnail_generator().thumbnail(
+        media_file.path, thumbs_dir, (media_file.mtime_ns, media_file.size), member_opener(media, media_file)
+    )
+    if not name:
+        return ""
+    media_server = get_media_server()
+    if thumbs_token and media_server:
+        return media_server.url_for(thumbs_token, name)
+    # Previews are small JPEGs: inline mode embeds them and the original only opens in the modal
+    base64_data = get_media_encoding_cache().get(os.path.join(thumbs_dir, name))
+    return f"data:image/jpeg;base64,{base64_data}" if base64_data else ""
+
+
+def media_src(media_file: MediaFile, media: MediaManifest, media_token: Optional[str]) -> str:
+    """URL (media server) or data URI (inline mode) for an attachment; "" if unreadable."""
+    media_server = get_media_server()
+    if media_token and media_server:
+        return media_server.url_for(media_token, media_file.name)
+    base64_data = get_media_encoding_cache().get(
+        media_file.path, (media_file.mtime_ns, media_file.size), member_opener(media, media_file)
+    )
+    return f"data:{media_file.mime};base64,{base64_data}" if base64_data else ""
+
+
 # ==========================
-# Parsing Logic
+# Shared Chats
 # ==========================
-# WhatsApp exports have two common shapes:
-#  A) Android:  "DD.MM.YYYY, HH:MM - Name: Message"
-#  B) iOS:      "[DD.MM.YYYY, HH:MM] Name: Message"  or "DD/MM/YY, HH:MM - Name: Message"
-#  Plus 12h/AM-PM variants and different separators.
-#  Multiline messages: subsequent lines do not start with a timestamp prefix.
-
-# Precompile multiple timestamp regexes (EN/RU tolerant)
-# We capture: datetime string, then user, then message
-
-# New format: [10/1/25, 11:58:38] ~Gulmira: message
-# Note: Handle invisible Unicode characters like \u200e
-NEW_BRACKET_RE = rx.compile(
-    r"^[\u200e]*\[(?P<dt>\d{1,2}/\d{1,2}/\d{2,4},?\s+\d{1,2}:\d{2}:\d{2})\]\s+(?P<user>[^:]+):\s+(?P<msg>.*)$"
-)
+# Loaded chats shared by the sessions of this process (chat_cache.ChatRegistry)
 
-# Media attachment format: [10/1/25, 12:02:23] ~Gulmira: ‎<attached: filename>
-# Note: Handle invisible Unicode characters like \u200e
-MEDIA_ATTACHMENT_RE = rx.compile(
-    r"^[\u200e]*\[(?P<dt>\d{1,2}/\d{1,2}/\d{2,4},?\s+\d{1,2}:\d{2}:\d{2})\]\s+(?P<user>[^:]+):\s+[\u200e]*<attached:\s+(?P<filename>[^>]+)>$"
-)
+@st.cache_resource
+def get_chat_registry() -> ChatRegistry:
+    """Loaded chats shared by all sessions of this process."""
+    return ChatRegistry()
 
-# Original Android format: "01.01.2024, 12:34 - Name: message"
-ANDROID_RE = rx.compile(
-    r"^(?P<dt>\d{1,2}[./]\d{1,2}[./]\d{2,4},?\s+\d{1,2}:\d{2}(?:\s*[APap][Mm])?)\s+-\s+(?P<user>[^:]+):\s+(?P<msg>.*)$"
-)
 
-# Original iOS bracket format: "[01.01.2024, 12:34] Name: message"
-IOS_BRACKET_RE = rx.compile(
-    r"^\[(?P<dt>\d{1,2}[.//]\d{1,2}[.//]\d{2,4},?\s+\d{1,2}:\d{2}(?:\s*[APap][Mm])?)\]\s+(?P<user>[^:]+):\s+(?P<msg>.*)$"
-)
+# ==========================
+# Session Chat Cache
+# ==========================
+# Chats viewed in this session, within a byte budget (chat_cache.ChatCacheManager)
 
-# Generic format fallback
-GENERIC_RE = rx.compile(
-    r"^(?P<dt>\d{1,2}[.//]\d{1,2}[.//]\d{2,4},?\s+\d{1,2}:\d{2}(?:\s*[APap][Mm])?)\s+-\s+(?P<user>[^:]+):\s+(?P<msg>.*)$"
-)
+CHAT_CACHE_BYTES = int(os.environ.get("WHATSAPP_VIZ_CHAT_CACHE_MB", "1024")) << 20
 
-# System messages
-SYSTEM_LINE_RE = rx.compile(
-    # Lines like: "01.01.2024, 12:34 - Messages to this group are now secured with end-to-end encryption."
-    r"^(?P<dt>\d{1,2}[.//]\d{1,2}[.//]\d{2,4},?\s+\d{1,2}:\d{2}(?:\s*[APap][Mm])?)\s+-\s+(?P<msg>.+)$"
-)
 
-MEDIA_MARKERS = {
-    "<Media omitted>",  # EN Android/iOS
-    "<Медиафайл опущен>",  # RU
-    "<Arquivo de mídia omitido>",  # PT
-    "<Archivo omitido>",  # ES
-    "<attached:",  # New format media attachments
-}
-
-@dataclass
-class ChatLine:
-    dt_raw: str
-    user: Optional[str]
-    text: str
-    is_system: bool
-
-
-def parse_datetime(s: str) -> Optional[pd.Timestamp]:
-    # Try month-first parsing primarily for MM/DD/YY format; fallback to day-first
-    for dayfirst in (False, True):
-        try:
-            return pd.to_datetime(dtparser.parse(s, dayfirst=dayfirst))
-        except Exception:
-            pass
-    return None
-
-
-def iter_lines(text: str) -> Iterable[str]:
-    # Normalize Windows newlines
-    for line in text.splitlines():
-        yield line.strip("\ufeff\ufeff\ufeff\n\r ")
-
-
-def parse_whatsapp_export(txt: str) -> List[ChatLine]:
-    rows: List[ChatLine] = []
-    current: Optional[ChatLine] = None
-
-    for raw in iter_lines(txt):
-        if not raw:
-            # Empty line — append to current message as newline
-            if current is not None:
-                current.text += "\n"
-            continue
-
-        # Try new format first, then fall back to original formats
-        m = (NEW_BRACKET_RE.match(raw) or 
-             MEDIA_ATTACHMENT_RE.match(raw) or 
-             ANDROID_RE.match(raw) or 
-             IOS_BRACKET_RE.match(raw) or 
-             GENERIC_RE.match(raw))
-        
-        if m:
-            # Commit previous
-            if current is not None:
-                rows.append(current)
-            dt_str = m.group("dt")
-            user = m.group("user").strip()
-            
-            # Handle media attachments
-            if "filename" in m.groupdict() and m.group("filename"):
-                msg = f"<attached: {m.group('filename')}>"
-            else:
-                msg = m.group("msg")
-                
-            current = ChatLine(dt_raw=dt_str, user=user, text=msg, is_system=False)
-            continue
-
-        # System message line (no user)
-        m2 = SYSTEM_LINE_RE.match(raw)
-        if m2:
-            if current is not None:
-                rows.append(current)
-            dt_str = m2.group("dt")
-            msg = m2.group("msg")
-            current = ChatLine(dt_raw=dt_str, user=None, text=msg, is_system=True)
-            continue
-
-        # Continuation of previous message
-        if current is None:
-            # Orphan line without header — treat as system without date
-            current = ChatLine(dt_raw="", user=None, text=raw, is_system=True)
-        else:
-            current.text += ("\n" if current.text else "") + raw
+def get_chat_cache_manager() -> ChatCacheManager:
+    if 'chat_cache_manager' not in st.session_state:
+        st.session_state.chat_cache_manager = ChatCacheManager(CHAT_CACHE_BYTES)
+    return st.session_state.chat_cache_manager
+
+
+def filtered_frame(chat_cache: dict, df: pd.DataFrame, engine: FilterEngine, state: FilterState) -> pd.DataFrame:
+    """df rows for the filter state; reused from the session while the state is unchanged."""
+    cached = chat_cache.get('filtered')
+    if cached is None or cached[0] != state:
+        cached = (state, df.iloc[engine.rows(state)])
+        chat_cache['filtered'] = cached
+    return cached[1]
+
 
-    if current is not None:
-        rows.append(current)
+def full_days(first: date, last: date) -> Tuple[pd.Timestamp, pd.Timestamp]:
+    """Date range filter covering the whole days first..last."""
+    return pd.Timestamp(first), pd.Timestamp(last) + pd.Timedelta(days=1) - pd.Timedelta(milliseconds=1)
 
-    return rows
+
+def load_chat_session(chat_cache: dict, status, checked: Optional[CacheCheck] = None) -> None:
+    """Load chat_cache['chat_file_path'] into the session, shared with other sessions viewing it.
+
+    `checked` is this rerun's check of the parsed cache, if one was made for the summary.
+    """
+    chat_file_path = chat_cache['chat_file_path']
+    archive = chat_cache.get('archive')
+    extracted_dir = os.path.dirname(chat_file_path)
+    registry = get_chat_registry()
+    key = chat_source_key(chat_file_path, archive)
+    chat = registry.get(key)
+    if chat is None:
+        with st.spinner("Loading chat..."):
+            chat, shared = registry.get_or_load(key, partial(load_chat, chat_file_path, archive, checked))
+    else:
+        shared = True
+    load_mode = "shared" if shared else chat.how
+    
+    # Start building previews in the background while the page renders
+    media = chat_cache['media']
+    get_thumbnail_generator().prefetch(
+        ((f.path, (f.mtime_ns, f.size), member_opener(media, f)) for f in media.attachments()),
+        thumbs_dir_for(extracted_dir),
+    )
+    
+    chat_cache.update({
+        'chat': chat,
+        'summary': chat.summary,
+        'media_dir': extracted_dir,
+    })
+    
+    if load_mode == "shared":
+        status.success(f"Opened the copy already loaded by another session: {os.path.basename(extracted_dir)}/")
+    elif load_mode == "cached":
+        status.success(f"Loaded parsed cache for: {os.path.basename(extracted_dir)}/")
+    elif load_mode == "appended":
+        status.success(f"Updated cached chat with new messages from: {os.path.basename(extracted_dir)}/")
+    else:
+        status.success(f"Loaded from: {os.path.basename(extracted_dir)}/")
+
+
+def render_kpis(container, messages: int, participants: int, days: int, media: int) -> None:
+    c1, c2, c3, c4 = container.columns(4)
+    c1.metric("Total messages", int(messages))
+    c2.metric("Participants", int(participants))
+    c3.metric("Days covered", int(days))
+    c4.metric("Media (heuristic)", int(media))
 
 
 # ==========================
-# DataFrame Utilities
+# Chat Rendering
 # ==========================
 
-def to_dataframe(lines: List[ChatLine]) -> pd.DataFrame:
-    df = pd.DataFrame([
-        {
-            "dt_raw": ln.dt_raw,
-            "user": (ln.user or "—system—").strip(),
-            "text": ln.text or "",
-            "is_system": ln.is_system,
-        }
-        for ln in lines
-    ])
-
-    # Parse timestamps
-    df["timestamp"] = df["dt_raw"].apply(parse_datetime)
-    # Some orphan/system lines may have None — we'll handle this properly
-
-    # Basic derived fields - only for valid timestamps
-    df["date"] = df["timestamp"].apply(lambda x: x.date() if pd.notna(x) else None)
-    df["hour"] = df["timestamp"].apply(lambda x: x.hour if pd.notna(x) else None)
-    df["weekday"] = df["timestamp"].apply(lambda x: x.day_name() if pd.notna(x) else None)
-
-    # Media flag (heuristic)
-    df["is_media"] = df["text"].apply(lambda t: any(mark in t for mark in MEDIA_MARKERS))
-
-    return df
-
-
-def filter_df(
-    df: pd.DataFrame,
-    users: Optional[List[str]] = None,
-    date_range: Optional[Tuple[pd.Timestamp, pd.Timestamp]] = None,
-    query: str = "",
-    include_system: bool = False,
-) -> pd.DataFrame:
-    out = df.copy()
-    if not include_system:
-        out = out[~out["is_system"]]
-    if users:
-        out = out[out["user"].isin(users)]
-    if date_range and all(date_range):
-        start, end = date_range
-        out = out[(out["timestamp"] >= start) & (out["timestamp"] <= end)]
-    if query:
-        # Case-insensitive contains, supports Cyrillic
-        pat = rx.compile(rx.escape(query), flags=rx.IGNORECASE)
-        out = out[out["text"].apply(lambda s: bool(pat.search(s)))]
-    return out
+CHAT_VIEW_KEY = "chat_view_window"
+CHAT_WINDOW_ROWS = 150
+
+
+@st.fragment
+def render_chat_window(chat_messages: pd.DataFrame, renderer: ChatRenderer) -> None:
+    """Virtualised chat for "All": one window of rows at a time, fetched as the user scrolls.
+
+    Runs as a fragment, so moving the window reruns only this function, not the whole page.
+    """
+    total = len(chat_messages)
+    # Identifies the current filter result; a different one starts from the top again
+    timestamps = chat_messages["timestamp"]
+    view = f"{total}:{timestamps.iloc[0]}:{timestamps.iloc[-1]}"
+
+    requested = st.session_state.get(CHAT_VIEW_KEY)
+    start = requested["start"] if requested and requested.get("view") == view else 0
+    start = max(0, min(int(start), total - CHAT_WINDOW_ROWS))
+
+    rows = renderer.render_rows(chat_messages.iloc[start:start + CHAT_WINDOW_ROWS])
+    chat_window(rows, start=start, total=total, view=view, window=CHAT_WINDOW_ROWS, key=CHAT_VIEW_KEY)
 
 
 # ==========================
@@ -264,7 +336,7 @@ def filter_df(
 
 st.set_page_config(page_title="WhatsApp Dialog Visualizer", layout="wide")
 st.title("💬 WhatsApp Dialog Visualizer")
-st.caption("Select a folder containing WhatsApp chat export (_chat.txt and media files).")
+st.caption("Select a folder containing WhatsApp chat export (_chat.txt and media files), or the export .zip.")
 
 with st.sidebar:
     st.header("1) Select Chat Folder")
@@ -273,7 +345,7 @@ with st.sidebar:
     folder_path = st.text_input(
         "Enter folder path:",
         placeholder="C:\\Users\\Username\\Downloads\\WhatsApp Chat - Самат🦅",
-        help="Enter the full path to the folder containing _chat.txt and media files"
+        help="Enter the full path to the folder containing _chat.txt and media files, or to the exported .zip"
     )
     
     # Quick path suggestions
@@ -304,7 +376,7 @@ with st.sidebar:
                 for item in os.listdir(downloads_path):
                     if item.startswith("WhatsApp Chat - "):
                         full_path = os.path.join(downloads_path, item)
-                        if os.path.isdir(full_path):
+                        if os.path.isdir(full_path) or is_chat_archive(full_path):
                             whatsapp_folders.append(full_path)
             except:
                 pass
@@ -365,14 +437,14 @@ if st.session_state.loaded_chats:
     if st.button("🗑️ Clear All Chats"):
         st.session_state.loaded_chats = []
         st.session_state.selected_chat = None
-        # Clear all chat cache keys
+        # Clear all chat cache keys (the chat cache manager included)
         keys_to_remove = [key for key in st.session_state.keys() if key.startswith('chat_')]
         for key in keys_to_remove:
             del st.session_state[key]
         st.rerun()
 
 if not folder_path or not os.path.exists(folder_path):
-    st.info("Enter a valid folder path containing WhatsApp chat export to begin.")
+    st.info("Enter a valid folder path containing WhatsApp chat export (or the export .zip) to begin.")
     st.stop()
 
 # Process the selected folder
@@ -407,67 +479,67 @@ try:
     # Use the selected folder directly
     extracted_dir = current_folder
     
-    # Check if we need to re-read (if chat changed)
-    chat_cache_key = f"chat_{st.session_state.get('selected_chat', 'default')}"
-    if chat_cache_key not in st.session_state:
-        st.session_state[chat_cache_key] = {}
+    # Check if we need to re-read (if chat changed); chats viewed earlier may have been
+    # unloaded to stay within the session's memory budget
+    chat_caches = get_chat_cache_manager()
+    chat_cache_key = st.session_state.get('selected_chat') or 'default'
+    chat_cache = chat_caches.get(chat_cache_key)
+    # Loading messages stay above the filters even when the chat loads after them
+    load_status = st.sidebar.container()
+    # A zipped export is read in place; reopened if the archive is replaced
+    archive = chat_cache.get('archive')
+    if archive is not None and not archive.is_current():
+        # Stop serving the old version, then release its file handle
+        media_server = get_media_server() if media_over_http() else None
+        if media_server:
+            media_server.unregister_archive(archive)
+        archive.close()
+        archive = None
+    if archive is None and is_chat_archive(extracted_dir):
+        archive = ChatArchive(extracted_dir)
+    chat_cache['archive'] = archive
+    # Files of the folder (or archive), listed once and stored with the cache; a
+    # rerun only checks the folder's mtime
+    chat_cache['media'] = load_media_manifest(
+        extracted_dir, export_cache_dir(extracted_dir), chat_cache.get('media'), archive
+    )
+    # Validity of the parsed cache, checked at most once per rerun (it may hash _chat.txt)
+    cache_check: Optional[CacheCheck] = None
     
-    # Read if not already cached
-    if 'raw_txt' not in st.session_state[chat_cache_key]:
+    if 'chat' in chat_cache:
+        load_status.info(f"Using cached data from: {os.path.basename(extracted_dir)}/")
+    else:
         # Look for _chat.txt in the folder
-        chat_files = [f for f in os.listdir(extracted_dir) if f.endswith('_chat.txt')]
+        chat_files = chat_cache['media'].chat_files()
         
         if not chat_files:
-            st.error("No _chat.txt file found in the folder. Please ensure the folder contains the WhatsApp chat export.")
+            st.error("No _chat.txt file found in the folder or archive. Please ensure it contains the WhatsApp chat export.")
             st.stop()
         
         # Use the first _chat.txt file found
-        chat_file = chat_files[0]
-        chat_file_path = os.path.join(extracted_dir, chat_file)
-        
-        with open(chat_file_path, 'r', encoding='utf-8') as f:
-            raw_txt = f.read()
-        
-        # Count media files for info
-        media_files = [f for f in os.listdir(extracted_dir) if not f.endswith('_chat.txt')]
-        
-        # Cache the data
-        st.session_state[chat_cache_key] = {
-            'raw_txt': raw_txt,
-            'media_files': media_files,
-            'media_dir': extracted_dir
-        }
-        
-        st.sidebar.success(f"Loaded from: {os.path.basename(extracted_dir)}/")
-    else:
-        # Use cached data
-        raw_txt = st.session_state[chat_cache_key]['raw_txt']
-        media_files = st.session_state[chat_cache_key]['media_files']
-        st.sidebar.info(f"Using cached data from: {os.path.basename(extracted_dir)}/")
-    
-    st.session_state.media_dir = extracted_dir
-    
-    st.sidebar.info(f"Found {len(media_files)} media files in the folder.")
+        chat_cache['chat_file_path'] = os.path.join(extracted_dir, chat_files[0])
+        # A valid parsed cache carries the chat summary: the filters and the KPI row
+        # render from it before the messages are loaded
+        if chat_cache.get('summary') is None:
+            cache_check = check_chat_cache(chat_cache['chat_file_path'], archive)
+            chat_cache['summary'] = cache_check.summary
+        if chat_cache['summary'] is None:
+            load_chat_session(chat_cache, load_status, cache_check)
         
 except Exception as e:
     st.error(f"Error reading folder: {str(e)}")
     st.stop()
-lines = parse_whatsapp_export(raw_txt)
 
-df = to_dataframe(lines)
-
-if df.empty:
-    st.error("Could not parse any messages. Please verify the export format.")
-    st.stop()
+summary = chat_cache['summary']
 
 # Sidebar filters
 with st.sidebar:
     st.header("2) Filters")
-    participants = sorted([u for u in df["user"].unique().tolist() if u != "—system—"]) or ["—"]
+    participants = list(summary["participants"]) or ["—"]
     sel_users = st.multiselect("Participants", options=participants, default=participants)
 
-    min_ts = df["timestamp"].dropna().min()
-    max_ts = df["timestamp"].dropna().max()
+    min_ts = pd.Timestamp(summary["first_timestamp"])
+    max_ts = pd.Timestamp(summary["last_timestamp"])
     
     # Handle date range input with proper None handling
     if pd.notna(min_ts) and pd.notna(max_ts):
@@ -484,49 +556,88 @@ with st.sidebar:
     # Convert date to Timestamps covering full days
     date_range: Optional[Tuple[pd.Timestamp, pd.Timestamp]] = None
     if isinstance(dr, (list, tuple)) and len(dr) == 2 and all(dr):
-        start = pd.Timestamp(dr[0])
-        end = pd.Timestamp(dr[1]) + pd.Timedelta(days=1) - pd.Timedelta(milliseconds=1)
-        date_range = (start, end)
+        date_range = full_days(dr[0], dr[1])
 
     # Search and filters will be moved above chat
 
-# Apply filters (using values from above chat)
-# Initialize search and system variables
-q = ""
-show_system = False
-fdf = filter_df(df, users=sel_users, date_range=date_range, query=q, include_system=show_system)
-
-# KPI row
-c1, c2, c3, c4 = st.columns(4)
-with c1:
-    st.metric("Total messages", int(len(fdf)))
-with c2:
-    st.metric("Participants", int(fdf["user"].nunique()))
-with c3:
-    st.metric("Days covered", int(fdf["date"].nunique()))
-with c4:
-    st.metric("Media (heuristic)", int(fdf["is_media"].sum()))
+# All filters in one state. The search box and system toggle render above the chat
+# further down; their values from the last interaction are already in session_state,
+# so KPIs, charts and chat all read the same filtered rows.
+filter_state = FilterState.of(
+    sel_users, date_range,
+    st.session_state.get('search_above_chat', ''), st.session_state.get('system_above_chat', False),
+)
+
+# KPI row: with the default filters it is the chat summary, shown before loading
+kpi_row = st.container()
+default_state = FilterState.of(
+    participants, full_days(default_start, default_end) if default_start and default_end else None,
+)
+kpis_from_summary = filter_state == default_state and summary["first_timestamp"] is not None
+if kpis_from_summary:
+    render_kpis(
+        kpi_row, summary["messages"], sum(1 for n in summary["participants"].values() if n),
+        summary["days"], summary["media"],
+    )
+
+try:
+    if 'chat' not in chat_cache:
+        load_chat_session(chat_cache, load_status, cache_check)
+    df = chat_cache['chat'].df
+    filter_engine = chat_cache['chat'].filter_engine
+    rollups = chat_cache['chat'].rollups
+    media = chat_cache['media']
+    
+    st.session_state.media_dir = extracted_dir
+    
+    load_status.info(f"Found {len(media.attachments())} media files in the folder.")
+    if df.attrs.get("datetime_format"):
+        load_status.caption(
+            f"Timestamp format: `{df.attrs['datetime_format']}` — "
+            f"{df.attrs.get('timestamp_fallback_rows', 0)} rows needed fallback parsing."
+        )
+    with load_status.expander("Memory usage"):
+        report = memory_report(df)
+        st.dataframe(report.style.format({"MB": "{:.1f}", "bytes/message": "{:.0f}"}), use_container_width=True)
+        st.caption(f"{report.loc['total', 'bytes/message']:.0f} bytes per message, {len(df):,} messages.")
+        
+except Exception as e:
+    st.error(f"Error reading folder: {str(e)}")
+    st.stop()
+
+if df.empty:
+    st.error("Could not parse any messages. Please verify the export format.")
+    st.stop()
+
+fdf = filtered_frame(chat_cache, df, filter_engine, filter_state)
+unloaded = chat_caches.fit(chat_cache_key)
+loaded_chats = chat_caches.loaded()
+load_status.caption(
+    f"Chats in memory: {len(loaded_chats)} — {chat_caches.total_bytes / 2**20:,.1f} MB "
+    f"of {chat_caches.max_bytes / 2**20:,.0f} MB"
+)
+load_status.progress(min(1.0, chat_caches.total_bytes / max(chat_caches.max_bytes, 1)))
+if unloaded:
+    load_status.caption(f"Unloaded to stay within the budget (reloaded from disk when viewed): {', '.join(unloaded)}")
+if not kpis_from_summary:
+    render_kpis(kpi_row, len(fdf), fdf["user"].nunique(), fdf["date"].nunique(), fdf["is_media"].sum())
 
 st.divider()
 
 # Charts
-st.subheader("Messages over time (daily)")
-# Ensure timestamp column is properly converted to datetime and filter valid timestamps
-valid_timestamps = fdf.dropna(subset=["timestamp"]).copy()
-if not valid_timestamps.empty:
-    valid_timestamps["timestamp"] = pd.to_datetime(valid_timestamps["timestamp"])
-    by_day = (
-        valid_timestamps.assign(day=lambda d: d["timestamp"].dt.floor("D"))
-        .groupby("day").size().reset_index(name="messages")
-    )
-else:
-    by_day = pd.DataFrame(columns=["day", "messages"])
-
-if not by_day.empty:
+# Counts are summed from the rollup cubes (or counted from the filtered rows for a search)
+TIMELINE_LABELS = {"hour": "hourly", "day": "daily", "week": "weekly", "month": "monthly", "year": "yearly"}
+filtered_rows = filter_engine.rows(filter_state)
+# One bar per hour, day, week, month or year, whichever fits the shown range in
+# MAX_CHART_POINTS bars
+timeline, resolution = rollups.timeline_counts(filter_state, filtered_rows)
+st.subheader(f"Messages over time ({TIMELINE_LABELS[resolution]})")
+
+if not timeline.empty:
     chart = (
-        alt.Chart(by_day)
+        alt.Chart(timeline)
         .mark_bar()
-        .encode(x=alt.X("day:T", title="Date"), y=alt.Y("messages:Q", title="Messages"))
+        .encode(x=alt.X("period:T", title="Date"), y=alt.Y("messages:Q", title="Messages"))
         .properties(height=200)
         .interactive()
     )
@@ -535,25 +646,14 @@ else:
     st.info("No dated messages available for the selected filters.")
 
 st.subheader("Activity heatmap (weekday × hour)")
-# Ensure timestamp column is properly converted to datetime and filter valid timestamps
-valid_timestamps_heat = fdf.dropna(subset=["timestamp"]).copy()
-if not valid_timestamps_heat.empty:
-    valid_timestamps_heat["timestamp"] = pd.to_datetime(valid_timestamps_heat["timestamp"])
-    heat = valid_timestamps_heat.assign(
-        Weekday=lambda d: d["timestamp"].dt.day_name(),
-        Hour=lambda d: d["timestamp"].dt.hour,
-    )
-else:
-    heat = pd.DataFrame(columns=["timestamp", "Weekday", "Hour"])
-if not heat.empty:
-    order = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-    heat_counts = heat.groupby(["Weekday", "Hour"]).size().reset_index(name="count")
+heat_counts = rollups.heatmap_counts(filter_state, filtered_rows)
+if not heat_counts.empty:
     heat_chart = (
         alt.Chart(heat_counts)
         .mark_rect()
         .encode(
             x=alt.X("Hour:O", title="Hour"),
-            y=alt.Y("Weekday:O", sort=order, title="Weekday"),
+            y=alt.Y("Weekday:O", sort=WEEKDAYS, title="Weekday"),
             tooltip=["Weekday", "Hour", "count"],
             color=alt.Color("count:Q", title="Messages"),
         )
@@ -584,10 +684,10 @@ st.subheader(f"💬 {chat_title}")
 col1, col2, col3, col4 = st.columns([2, 1, 1, 1])
 
 with col1:
-    q = st.text_input("Search text (regex-safe, case-insensitive contains)", key="search_above_chat")
+    st.text_input("Search text (regex-safe, case-insensitive contains)", key="search_above_chat")
 
 with col2:
-    show_system = st.checkbox("Include system messages", value=False, key="system_above_chat")
+    st.checkbox("Include system messages", value=False, key="system_above_chat")
 
 with col3:
     st.write("")  # Spacer
@@ -596,21 +696,17 @@ with col4:
     st.write("")  # Spacer
 
 # Chat View Settings above chat
-participants = sorted([u for u in df["user"].unique().tolist() if u != "—system—"]) or ["—"]
+participants = list(summary["participants"]) or ["—"]  # Sorted senders, system excluded
 if participants and participants != ["—"]:
     me_user = participants[0]  # Default to first participant
 else:
     me_user = None
 
-# Re-apply filters with values from above chat
-q = st.session_state.get('search_above_chat', '')
-show_system = st.session_state.get('system_above_chat', False)
-fdf = filter_df(df, users=sel_users, date_range=date_range, query=q, include_system=show_system)
-
 # Create a chat-like visualization
 if not fdf.empty:
-    # Sort messages by timestamp (oldest first for chat view)
-    chat_messages = fdf.sort_values("timestamp", ascending=True).reset_index(drop=True)
+    # Oldest first for the chat view; the engine's time order avoids sorting the frame
+    time_order = filter_engine.time_order_of(filtered_rows)
+    chat_messages = (fdf if time_order is None else fdf.iloc[time_order]).reset_index(drop=True)
     
     # Show message count
     total_messages = len(chat_messages)
@@ -662,283 +758,28 @@ if not fdf.empty:
     chat_container = st.container()
     
     with chat_container:
-        # Normal chat mode (no fullscreen)
-        chat_height = "600px"
-        chat_style = f"""
-        height: {chat_height}; 
-        overflow-y: auto; 
-        border: 1px solid #ddd; 
-        border-radius: 10px; 
-        padding: 10px; 
-        background-color: #f8f9fa;
-        margin-bottom: 20px;
-        """
-        
-        # Create scrollable window using components.html
-        chat_html = f"""
-        <div style="{chat_style}">
-        """
-        
-        # Add all messages to the HTML
-        for idx, row in chat_messages.iterrows():
-            # Determine if this is a system message
-            if row["is_system"] or row["user"] == "—system—":
-                # System message styling
-                chat_html += f"""
-                <div style="
-                    background-color: #f0f0f0; 
-                    padding: 8px 12px; 
-                    margin: 4px 0; 
-                    border-radius: 8px; 
-                    text-align: center; 
-                    font-size: 0.9em; 
-                    color: #666;
-                    border-left: 3px solid #ddd;
-                ">
-                    {row["text"]}
-                </div>
-                """
-            else:
-                # Determine message alignment based on user
-                is_my_message = row["user"] == me_user if me_user else False
-                
-                # Message bubble styling - narrower bubbles
-                if is_my_message:
-                    # Right side (my messages) - green
-                    bubble_style = """
-                        background-color: #DCF8C6; 
-                        margin-left: 50%; 
-                        margin-right: 0; 
-                        border-radius: 18px 18px 4px 18px;
-                        text-align: right;
-                        max-width: 45%;
-                    """
-                    time_style = "text-align: right; margin-right: 8px;"
-                else:
-                    # Left side (other messages) - white
-                    bubble_style = """
-                        background-color: #FFFFFF; 
-                        margin-left: 0; 
-                        margin-right: 50%; 
-                        border-radius: 18px 18px 18px 4px;
-                        text-align: left;
-                        border: 1px solid #E5E5E5;
-                        max-width: 45%;
-                    """
-                    time_style = "text-align: left; margin-left: 8px;"
-                
-                # Format timestamp
-                timestamp_str = ""
-                if pd.notna(row["timestamp"]):
-                    timestamp_str = row["timestamp"].strftime("%d.%m.%Y %H:%M")
-                
-                # Handle media attachments
-                message_text = row["text"]
-                is_media_message = False
-                media_html = ""
-                
-                if row["is_media"] and "<attached:" in message_text:
-                    # Extract filename from attachment
-                    import re
-                    match = re.search(r'<attached:\s*([^>]+)>', message_text)
-                    if match:
-                        filename = match.group(1).strip()
-                        is_media_message = True
-                        message_text = f"🎵 {filename}"
-                        
-                        # Check if file exists in extracted directory
-                        media_dir = st.session_state.get('media_dir', '')
-                        file_path = os.path.join(media_dir, filename)
-                        
-                        if os.path.exists(file_path):
-                            # Check file size first
-                            file_size = os.path.getsize(file_path)
-                            if file_size == 0:
-                                media_html = f"""
-                                <div style="margin-top: 8px; color: #999; font-size: 0.9em;">
-                                    ⚠️ Audio file is empty
-                                </div>
-                                """
-                            else:
-                                # Determine file type and create appropriate HTML
-                                file_ext = os.path.splitext(filename)[1].lower()
-                                
-                                if file_ext in ['.opus', '.mp3', '.wav', '.m4a', '.ogg']:
-                                    # Audio file - embed directly in chat with proper MIME type
-                                    mime_type = "audio/opus" if file_ext == '.opus' else f"audio/{file_ext[1:]}"
-                                    base64_data = get_file_base64(file_path)
-                                    if base64_data:
-                                        media_html = f"""
-                                        <div style="margin-top: 8px;">
-                                            <audio controls preload="metadata" style="width: 100%; max-width: 300px; height: 40px;">
-                                                <source src="data:{mime_type};base64,{base64_data}" type="{mime_type}">
-                                                <source src="data:audio/mpeg;base64,{base64_data}" type="audio/mpeg">
-                                                Your browser does not support the audio element.
-                                            </audio>
-                                            <div style="font-size: 0.7em; color: #666; margin-top: 2px;">
-                                                {file_size} bytes
-                                            </div>
-                                        </div>
-                                        """
-                                    else:
-                                        media_html = f"""
-                                        <div style="margin-top: 8px; color: #999; font-size: 0.9em;">
-                                            ⚠️ Could not load audio file
-                                        </div>
-                                        """
-                                elif file_ext in ['.mp4', '.avi', '.mov', '.webm']:
-                                    # Video file - create clickable thumbnail with modal
-                                    media_html = f"""
-                                    <div style="margin-top: 8px;">
-                                        <div style="
-                                            background: #f0f0f0; 
-                                            border: 2px dashed #ccc; 
-                                            padding: 20px; 
-                                            text-align: center; 
-                                            border-radius: 8px; 
-                                            cursor: pointer;
-                                            max-width: 200px;
-                                        " onclick="openMediaModal('video', '{filename}', 'data:video/mp4;base64,{get_file_base64(file_path)}')">
-                                            <div style="font-size: 2em; margin-bottom: 8px;">🎥</div>
-                                            <div style="font-size: 0.9em; color: #666;">Click to play video</div>
-                                        </div>
-                                    </div>
-                                    """
-                                elif file_ext in ['.jpg', '.jpeg', '.png', '.gif', '.webp']:
-                                    # Image file - create clickable thumbnail with modal
-                                    media_html = f"""
-                                    <div style="margin-top: 8px;">
-                                        <img src="data:image/jpeg;base64,{get_file_base64(file_path)}" 
-                                             style="max-width: 200px; max-height: 150px; border-radius: 8px; cursor: pointer;" 
-                                             onclick="openMediaModal('image', '{filename}', 'data:image/jpeg;base64,{get_file_base64(file_path)}')">
-                                    </div>
-                                    """
-                                else:
-                                    # Other file types - show download link
-                                    media_html = f"""
-                                    <div style="margin-top: 8px;">
-                                        <a href="data:application/octet-stream;base64,{get_file_base64(file_path)}" 
-                                           download="{filename}" 
-                                           style="color: #007bff; text-decoration: none; font-size: 0.9em;">
-                                            📎 {filename}
-                                        </a>
-                                    </div>
-                                    """
-                
-                # Create message bubble
-                chat_html += f"""
-                <div style="margin: 8px 0;">
-                    <div style="{bubble_style} padding: 12px 16px; box-shadow: 0 1px 2px rgba(0,0,0,0.1);">
-                        <div style="font-weight: 500; color: #128C7E; font-size: 0.9em; margin-bottom: 4px;">
-                            {row["user"]}
-                        </div>
-                        <div style="color: #333; line-height: 1.4; word-wrap: break-word;">
-                            {message_text}
-                        </div>
-                        {media_html}
-                    </div>
-                    <div style="{time_style} font-size: 0.75em; color: #999; margin-top: 2px;">
-                        {timestamp_str}
-                    </div>
-                </div>
-                """
-        
-        chat_html += "</div>"
-        
-        # Add modal HTML and JavaScript
-        modal_html = """
-        <div id="mediaModal" style="
-            display: none; 
-            position: fixed; 
-            z-index: 1000; 
-            left: 0; 
-            top: 0; 
-            width: 100%; 
-            height: 100%; 
-            background-color: rgba(0,0,0,0.8);
-            cursor: pointer;
-        " onclick="closeMediaModal()">
-            <div style="
-                position: absolute;
-                top: 50%;
-                left: 50%;
-                transform: translate(-50%, -50%);
-                background: white;
-                padding: 20px;
-                border-radius: 10px;
-                max-width: 90%;
-                max-height: 90%;
-                cursor: default;
-            " onclick="event.stopPropagation()">
-                <div style="
-                    display: flex;
-                    justify-content: space-between;
-                    align-items: center;
-                    margin-bottom: 15px;
-                    border-bottom: 1px solid #eee;
-                    padding-bottom: 10px;
-                ">
-                    <h3 id="modalTitle" style="margin: 0; color: #333;"></h3>
-                    <button onclick="closeMediaModal()" style="
-                        background: none;
-                        border: none;
-                        font-size: 24px;
-                        cursor: pointer;
-                        color: #999;
-                    ">&times;</button>
-                </div>
-                <div id="modalContent" style="text-align: center;"></div>
-            </div>
-        </div>
-        
-        <script>
-        function openMediaModal(type, filename, dataUrl) {
-            const modal = document.getElementById('mediaModal');
-            const title = document.getElementById('modalTitle');
-            const content = document.getElementById('modalContent');
-            
-            title.textContent = filename;
-            
-            if (type === 'audio') {
-                content.innerHTML = `
-                    <audio controls style="width: 100%; max-width: 400px;">
-                        <source src="${dataUrl}" type="audio/opus">
-                        Your browser does not support the audio element.
-                    </audio>
-                `;
-            } else if (type === 'video') {
-                content.innerHTML = `
-                    <video controls style="width: 100%; max-width: 600px; max-height: 400px;">
-                        <source src="${dataUrl}" type="video/mp4">
-                        Your browser does not support the video element.
-                    </video>
-                `;
-            } else if (type === 'image') {
-                content.innerHTML = `
-                    <img src="${dataUrl}" style="max-width: 100%; max-height: 70vh; border-radius: 8px;">
-                `;
-            }
-            
-            modal.style.display = 'block';
-        }
-        
-        function closeMediaModal() {
-            document.getElementById('mediaModal').style.display = 'none';
-        }
-        
-        // Close modal on Escape key
-        document.addEventListener('keydown', function(event) {
-            if (event.key === 'Escape') {
-                closeMediaModal();
-            }
-        });
-        </script>
-        """
-        
-        chat_html += modal_html
+        # Attachments are served by URL from the media server when it is available
+        media_dir = st.session_state.get('media_dir', '')
+        media_server = get_media_server() if media_over_http() else None
+        archive = chat_cache.get('archive')
+        if media_server and archive is not None:
+            media_token = media_server.register_archive(archive, media)
+        else:
+            media_token = media_server.register(media_dir, media) if media_server else None
+        thumbs_dir = thumbs_dir_for(media_dir)
+        thumbs_token = media_server.register(thumbs_dir) if media_server else None
+        renderer = ChatRenderer(
+            me_user, media,
+            media_url=partial(media_src, media=media, media_token=media_token),
+            preview_url=partial(thumbnail_src, media=media, thumbs_dir=thumbs_dir, thumbs_token=thumbs_token),
+        )
         
-        # Render the scrollable chat window
-        components.html(chat_html, height=620)
+        if messages_per_page_choice == "All":
+            # Only the rows around the scroll position are rendered and sent
+            render_chat_window(chat_messages, renderer)
+        else:
+            # Render the scrollable chat window
+            components.html(renderer.render_page(chat_messages), height=620)
 else:
     st.info("No messages to display with current filters.")
 